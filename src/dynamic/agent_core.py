@@ -1,44 +1,93 @@
 import asyncio
+import operator
 import random
 import time
+from typing import Annotated, Dict, List, Optional
 
-from langgraph.graph import StateGraph, MessagesState
+from langgraph.graph import StateGraph, MessagesState, START, END
+
+from plan_executor import topological_order
 
 
 class AgentState(MessagesState):
-    result: int
+    # 并行分支各自返回本步的结果，由 reducer 相加合并，避免多个分支同时写 result 冲突
+    result: Annotated[int, operator.add]
+
+
+def linear_dependencies(step_count: int) -> Dict[str, List[str]]:
+    """step_1 -> step_2 -> ... -> step_n 的依赖描述"""
+    return {f"step_{i}": [f"step_{i-1}"] if i > 1 else [] for i in range(1, step_count+1)}
+
+
+def critical_path_length(dependencies: Dict[str, List[str]]) -> int:
+    """依赖图中最长链的步骤数（每步耗时相同时即为理论最短耗时）；依赖无效时抛 ValueError"""
+    depth: Dict[str, int] = {}
+    for step in topological_order(dependencies):
+        depth[step] = 1 + max((depth[d] for d in dependencies[step]), default=0)
+    return max(depth.values(), default=0)
 
 
-def build_graph(step_count: int):
+def build_graph(step_count: int = 7, dependencies: Optional[Dict[str, List[str]]] = None,
+                step_delay: float = 1.0, use_async: bool = True):
+    """
+    dependencies: {步骤名: [依赖的步骤名]}，不传时按 step_count 生成线性链；依赖无效时抛 ValueError。
+    没有依赖的步骤从 START 并行出发（fan-out），有多个依赖的步骤等待全部完成后执行（fan-in），
+    没有下游的步骤连到 END。use_async=False 时节点为同步函数，由 LangGraph 放到线程池执行，同样可以并行。
+    """
+    if dependencies is None:
+        dependencies = linear_dependencies(step_count)
+    # 依赖了不存在的步骤或存在循环依赖时在建图前报错
+    topological_order(dependencies)
+
     builder = StateGraph(AgentState)
-    steps = []
-    for step_index in range(1, step_count+1):
-        def wrapper(step_index: int):
+
+    def wrapper(step_name: str):
+        if use_async:
+            async def run(state: AgentState):
+                x: int = random.randint(0, 10)
+                await asyncio.sleep(step_delay)
+                return {"messages": [f"{step_name} finished with {x}"], "result": x}
+        else:
             def run(state: AgentState):
-                last_result = state["result"]
                 x: int = random.randint(0, 10)
-                time.sleep(1)
-                return {"messages": [f"step_{step_index} finished with {x}"], "result": x+last_result}
-            return run
-        run =wrapper(step_index)
-        steps.append(run)
-    for i in range(step_count):
-        builder.add_node(f"step_{i+1}", steps[i])
-
-    builder.set_entry_point("step_1")
-    for i in range(step_count-1):
-        builder.add_edge(f"step_{i+1}", f"step_{i+2}")
+                time.sleep(step_delay)
+                return {"messages": [f"{step_name} finished with {x}"], "result": x}
+        return run
+
+    for step in dependencies:
+        builder.add_node(step, wrapper(step))
+
+    has_dependents = {d for deps in dependencies.values() for d in deps}
+    for step, deps in dependencies.items():
+        if not deps:
+            builder.add_edge(START, step)
+        elif len(deps) == 1:
+            builder.add_edge(deps[0], step)
+        else:
+            # fan-in：等所有依赖都完成后才执行
+            builder.add_edge(list(deps), step)
+        if step not in has_dependents:
+            builder.add_edge(step, END)
 
     graph = builder.compile()
     return graph
 
 
 async def run_agent():
-    step_count = 7
-    graph = build_graph(step_count)
+    # step_1 之后分成三路并行，step_6 汇合 step_3/step_4，step_7 汇合全部分支
+    dependencies = {
+        "step_1": [],
+        "step_2": ["step_1"],
+        "step_3": ["step_1"],
+        "step_4": ["step_1"],
+        "step_5": ["step_2"],
+        "step_6": ["step_3", "step_4"],
+        "step_7": ["step_5", "step_6"],
+    }
+    graph = build_graph(dependencies=dependencies)
     async for step in graph.astream({"messages": [{"role": "user", "content": ""}], "result": 0}):
         print(step)
 
 
 if __name__ == '__main__':
-    asyncio.run(run_agent())
\ No newline at end of file
+    asyncio.run(run_agent())
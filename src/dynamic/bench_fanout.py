@@ -0,0 +1,43 @@
+"""
+fan-out / fan-in 基准：同样 7 个步骤（每步 step_delay 秒），比较线性链与按依赖并行的总耗时，
+并行时总耗时应接近关键路径长度 * step_delay。
+  linear:       原来的线性链
+  fanout-async: 依赖图 + async 节点（asyncio.sleep）
+  fanout-sync:  依赖图 + 同步节点（time.sleep，由 LangGraph 放到线程池）
+用法: python bench_fanout.py [step_delay]
+"""
+import asyncio
+import sys
+import time
+
+from agent_core import build_graph, critical_path_length, linear_dependencies
+
+DEPENDENCIES = {
+    "step_1": [],
+    "step_2": ["step_1"],
+    "step_3": ["step_1"],
+    "step_4": ["step_1"],
+    "step_5": ["step_2"],
+    "step_6": ["step_3", "step_4"],
+    "step_7": ["step_5", "step_6"],
+}
+
+
+async def run(name: str, dependencies, step_delay: float, use_async: bool):
+    graph = build_graph(dependencies=dependencies, step_delay=step_delay, use_async=use_async)
+    start = time.perf_counter()
+    state = await graph.ainvoke({"messages": [{"role": "user", "content": ""}], "result": 0})
+    elapsed = time.perf_counter() - start
+    bound = critical_path_length(dependencies) * step_delay
+    print(f"{name:>13}: 总耗时={elapsed:.2f}s  关键路径={bound:.2f}s  "
+          f"步骤数={len(state['messages']) - 1}  result={state['result']}")
+
+
+async def main(step_delay: float):
+    await run("linear", linear_dependencies(len(DEPENDENCIES)), step_delay, use_async=True)
+    await run("fanout-async", DEPENDENCIES, step_delay, use_async=True)
+    await run("fanout-sync", DEPENDENCIES, step_delay, use_async=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0))
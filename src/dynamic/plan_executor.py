@@ -0,0 +1,311 @@
+"""
+按 prompts/plan.md 的格式执行计划：计划是由 llm_reason / tool_call 步骤组成的 DAG，inputs_from 为依赖。
+
+- 依赖全部完成的步骤立即启动，互不依赖的步骤并发执行，并发数由 max_concurrency 限制
+- 每个步骤有超时（步骤上的 timeout 字段，或执行器的 step_timeout），超时 / 出错的步骤的下游全部跳过
+- 执行结束后给出报告：每个步骤的开始 / 结束时间、关键路径（按实际耗时计算的最长依赖链）以及相对串行执行的加速比
+
+步骤的具体执行由 step_runner 决定：make_step_runner(llm, tools) 按 prompts/execution.md 渲染提示词调用模型、
+按 tool_name 调用工具；__main__ 里用 asyncio.sleep 模拟。
+"""
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+EXECUTION_PROMPT = Path(__file__).resolve().parent.parent / "prompts" / "execution.md"
+
+
+@dataclass
+class PlanStep:
+    id: str
+    type: str
+    description: str = ""
+    inputs_from: List[str] = field(default_factory=list)
+    output_type: str = "text"
+    tool_name: Optional[str] = None
+    timeout: Optional[float] = None
+
+
+@dataclass
+class StepResult:
+    id: str
+    status: str = "pending"  # ok / error / timeout / skipped
+    output: Any = None
+    error: Optional[str] = None
+    start: float = 0.0  # 相对计划开始的秒数
+    end: float = 0.0
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+StepRunner = Callable[[PlanStep, Dict[str, Any]], Awaitable[Any]]
+
+
+def parse_plan(plan) -> List[PlanStep]:
+    """解析计划（JSON 字符串或 dict），校验必填字段、id 唯一、依赖存在且无环，返回拓扑序的步骤列表；计划无效时抛 ValueError"""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    if isinstance(plan, dict):
+        if "plan" not in plan:
+            raise ValueError("计划缺少 plan 字段")
+        plan = plan["plan"]
+    steps = []
+    for i, raw in enumerate(plan):
+        if not isinstance(raw, dict):
+            raise ValueError(f"第 {i + 1} 个步骤不是对象: {raw!r}")
+        missing = [k for k in ("id", "type") if k not in raw]
+        if missing:
+            raise ValueError(f"第 {i + 1} 个步骤缺少必填字段: {missing}")
+        steps.append(PlanStep(**{k: v for k, v in raw.items() if k in PlanStep.__dataclass_fields__}))
+
+    by_id: Dict[str, PlanStep] = {}
+    for step in steps:
+        if step.id in by_id:
+            raise ValueError(f"计划中存在重复的步骤 id: {step.id}")
+        if step.type not in ("llm_reason", "tool_call"):
+            raise ValueError(f"步骤 {step.id} 的类型无效: {step.type}")
+        if step.type == "tool_call" and not step.tool_name:
+            raise ValueError(f"tool_call 步骤 {step.id} 缺少 tool_name")
+        by_id[step.id] = step
+    order = topological_order({s.id: s.inputs_from for s in steps})
+    return [by_id[step_id] for step_id in order]
+
+
+def topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+    """{步骤: [依赖的步骤]} 的拓扑序（Kahn 算法）；依赖了不存在的步骤或存在循环依赖时抛 ValueError"""
+    for step, deps in dependencies.items():
+        missing = [d for d in deps if d not in dependencies]
+        if missing:
+            raise ValueError(f"步骤 {step} 依赖了不存在的步骤: {missing}")
+
+    indegree = {step: len(deps) for step, deps in dependencies.items()}
+    dependents: Dict[str, List[str]] = {step: [] for step in dependencies}
+    for step, deps in dependencies.items():
+        for dep in deps:
+            dependents[dep].append(step)
+    ready = [step for step, d in indegree.items() if d == 0]
+    ordered = []
+    while ready:
+        step = ready.pop(0)
+        ordered.append(step)
+        for child in dependents[step]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    if len(ordered) != len(dependencies):
+        raise ValueError(f"存在循环依赖: {sorted(s for s, d in indegree.items() if d > 0)}")
+    return ordered
+
+
+def dependents_of(steps: List[PlanStep]) -> Dict[str, List[str]]:
+    dependents: Dict[str, List[str]] = {s.id: [] for s in steps}
+    for step in steps:
+        for dep in step.inputs_from:
+            dependents[dep].append(step.id)
+    return dependents
+
+
+@dataclass
+class PlanReport:
+    steps: List[PlanStep]
+    results: Dict[str, StepResult]
+    total: float
+
+    @property
+    def ok(self) -> bool:
+        return all(r.status == "ok" for r in self.results.values())
+
+    def critical_path(self) -> List[str]:
+        """按实际耗时计算的最长依赖链（未执行的步骤耗时记为 0）"""
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for step in self.steps:  # steps 为拓扑序
+            best = max(step.inputs_from, key=lambda d: longest[d], default=None)
+            longest[step.id] = (longest[best] if best else 0.0) + self.results[step.id].duration
+            previous[step.id] = best
+        node = max(longest, key=longest.get, default=None)
+        path = []
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        return path[::-1]
+
+    def summary(self) -> dict:
+        path = self.critical_path()
+        serial = sum(r.duration for r in self.results.values())
+        return {
+            "ok": self.ok,
+            "total_s": round(self.total, 3),
+            "serial_s": round(serial, 3),
+            "speedup": round(serial / self.total, 2) if self.total else None,
+            "critical_path": path,
+            "critical_path_s": round(sum(self.results[i].duration for i in path), 3),
+            "steps": {
+                r.id: {"status": r.status, "start": round(r.start, 3), "end": round(r.end, 3), "error": r.error}
+                for r in self.results.values()
+            },
+        }
+
+    def format(self) -> str:
+        lines = [f"{'step':<10}{'status':<9}{'start':>8}{'end':>8}{'dur':>8}  timeline"]
+        scale = 40 / self.total if self.total else 0
+        for step in self.steps:
+            r = self.results[step.id]
+            bar = " " * int(r.start * scale) + "#" * max(int(r.duration * scale), 1 if r.status != "skipped" else 0)
+            lines.append(f"{r.id:<10}{r.status:<9}{r.start:>8.2f}{r.end:>8.2f}{r.duration:>8.2f}  {bar}")
+        s = self.summary()
+        lines.append(f"总耗时 {s['total_s']}s，串行耗时 {s['serial_s']}s，加速比 {s['speedup']}x")
+        lines.append(f"关键路径 {' -> '.join(s['critical_path'])}（{s['critical_path_s']}s）")
+        return "\n".join(lines)
+
+
+class PlanExecutor:
+    def __init__(self, step_runner: StepRunner, max_concurrency: int = 4, step_timeout: float = 60.0):
+        self.step_runner = step_runner
+        self.max_concurrency = max_concurrency
+        self.step_timeout = step_timeout
+
+    async def run(self, plan) -> PlanReport:
+        steps = parse_plan(plan)
+        by_id = {s.id: s for s in steps}
+        dependents = dependents_of(steps)
+        results = {s.id: StepResult(s.id) for s in steps}
+        waiting = {s.id: len(s.inputs_from) for s in steps}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        origin = time.perf_counter()
+
+        async def execute(step: PlanStep) -> str:
+            result = results[step.id]
+            # 显式的 timeout=0 也按步骤自己的设置处理，只有未设置时才用执行器的默认值
+            timeout = self.step_timeout if step.timeout is None else step.timeout
+            async with semaphore:
+                result.start = time.perf_counter() - origin
+                inputs = {d: results[d].output for d in step.inputs_from}
+                try:
+                    result.output = await asyncio.wait_for(self.step_runner(step, inputs), timeout)
+                    result.status = "ok"
+                except asyncio.TimeoutError:
+                    result.status, result.error = "timeout", f"超过 {timeout}s"
+                except Exception as e:
+                    result.status, result.error = "error", f"{type(e).__name__}: {e}"
+                result.end = time.perf_counter() - origin
+            return step.id
+
+        def skip(step_id: str, reason: str) -> None:
+            result = results[step_id]
+            if result.status != "pending":
+                return
+            result.status, result.error = "skipped", reason
+            result.start = result.end = time.perf_counter() - origin
+            for child in dependents[step_id]:
+                skip(child, f"上游 {step_id} 未完成")
+
+        running = {asyncio.create_task(execute(s)) for s in steps if waiting[s.id] == 0}
+        try:
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    step_id = task.result()
+                    if results[step_id].status != "ok":
+                        for child in dependents[step_id]:
+                            skip(child, f"上游 {step_id} {results[step_id].status}")
+                        continue
+                    for child in dependents[step_id]:
+                        waiting[child] -= 1
+                        if waiting[child] == 0 and results[child].status == "pending":
+                            running.add(asyncio.create_task(execute(by_id[child])))
+        finally:
+            # 执行器自身被取消（或出错）时，取消已启动的步骤，不让它们在后台继续运行
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return PlanReport(steps, results, time.perf_counter() - origin)
+
+
+def render_execution_prompt(step: PlanStep, inputs: Dict[str, Any], next_tool_schema: str = "N/A") -> str:
+    """填充 execution.md；模板中含有 JSON 花括号，不能直接用 str.format"""
+    upstream = "\n".join(f"  - {k}: {v if isinstance(v, str) else json.dumps(v, ensure_ascii=False)}"
+                         for k, v in inputs.items()) or "  (none)"
+    values = {
+        "step_id": step.id,
+        "step_type": step.type,
+        "step_description": step.description,
+        "upstream_results": upstream,
+        "expected_output_type": step.output_type,
+        "next_tool_input_schema": next_tool_schema,
+    }
+    prompt = EXECUTION_PROMPT.read_text(encoding="utf-8")
+    for key, value in values.items():
+        prompt = prompt.replace("{" + key + "}", value)
+    return prompt
+
+
+def tool_args_from(inputs: Dict[str, Any]) -> dict:
+    """把上游输出合并为工具参数：上游按 execution.md 输出 {"result": {...}}，取出其中的 dict 合并"""
+    args: dict = {}
+    for output in inputs.values():
+        if isinstance(output, str):
+            try:
+                output = json.loads(output)
+            except ValueError:
+                continue
+        if isinstance(output, dict):
+            output = output.get("result", output)
+            if isinstance(output, dict):
+                args.update(output)
+    return args
+
+
+def make_step_runner(llm, tools) -> StepRunner:
+    """llm_reason 步骤调用 llm（按 execution.md 渲染提示词），tool_call 步骤按 tool_name 调用工具"""
+    tools_by_name = {t.name: t for t in tools}
+
+    async def run_step(step: PlanStep, inputs: Dict[str, Any]) -> Any:
+        if step.type == "tool_call":
+            tool = tools_by_name.get(step.tool_name)
+            if tool is None:
+                raise KeyError(f"未知工具: {step.tool_name}")
+            return await tool.ainvoke(tool_args_from(inputs))
+        response = await llm.ainvoke(render_execution_prompt(step, inputs))
+        return response.content
+
+    return run_step
+
+
+DEMO_PLAN = {
+    "plan": [
+        {"id": "step1", "type": "llm_reason", "description": "Extract the cities mentioned by the user.",
+         "inputs_from": [], "output_type": "list"},
+        {"id": "step2", "type": "tool_call", "tool_name": "get_weather", "description": "Weather in city A.",
+         "inputs_from": ["step1"], "output_type": "json"},
+        {"id": "step3", "type": "tool_call", "tool_name": "get_weather", "description": "Weather in city B.",
+         "inputs_from": ["step1"], "output_type": "json"},
+        {"id": "step4", "type": "llm_reason", "description": "Suggest clothing for city A.",
+         "inputs_from": ["step2"], "output_type": "text"},
+        {"id": "step5", "type": "llm_reason", "description": "Compare both cities and answer.",
+         "inputs_from": ["step3", "step4"], "output_type": "text"},
+    ]
+}
+
+
+async def simulated_step(step: PlanStep, inputs: Dict[str, Any]) -> str:
+    await asyncio.sleep(random.uniform(0.5, 1.0) if step.type == "llm_reason" else random.uniform(0.2, 0.5))
+    return f"{step.id} done"
+
+
+async def run_demo():
+    executor = PlanExecutor(simulated_step, max_concurrency=4, step_timeout=5)
+    report = await executor.run(DEMO_PLAN)
+    print(report.format())
+
+
+if __name__ == '__main__':
+    asyncio.run(run_demo())
@@ -1,16 +1,56 @@
 # mcp_server.py
-from mcp.server.fastmcp import FastMCP
+import asyncio
+
+from mcp.server.fastmcp import Context, FastMCP
 
 # 初始化MCP服务器
 mcp = FastMCP("WeatherServer")
 
+# 预加载的天气表（城市 -> (天气, 温度)），查询只做内存查表
+WEATHER_TABLE = {
+    "上海": ("晴朗", 25), "北京": ("多云", 18), "广州": ("阵雨", 29), "深圳": ("晴朗", 28),
+    "杭州": ("小雨", 22), "成都": ("阴", 20), "南京": ("晴朗", 23), "武汉": ("多云", 26),
+    "西安": ("晴朗", 19), "重庆": ("阴", 24), "天津": ("多云", 17), "苏州": ("小雨", 22),
+}
+DEFAULT_WEATHER = ("晴朗", 25)
+
+
+def lookup_weather(locations: list[str]) -> dict[str, str]:
+    """批量查表，重复的城市只查一次"""
+    result = {}
+    for location in dict.fromkeys(locations):
+        condition, temperature = WEATHER_TABLE.get(location, DEFAULT_WEATHER)
+        result[location] = f"Mock天气: {location} {condition}，{temperature}°C"
+    return result
+
+
 # 定义天气工具
 @mcp.tool()
 async def get_weather(location: str) -> str:
     """获取指定城市的天气信息"""
     # 简单mock返回结果
-    return f"Mock天气: {location} 晴朗，25°C"
+    return lookup_weather([location])[location]
+
+
+@mcp.tool()
+async def get_weather_batch(locations: list[str]) -> dict[str, str]:
+    """批量获取多个城市的天气信息，返回 城市 -> 天气"""
+    return lookup_weather(locations)
+
+
+@mcp.tool()
+async def get_weather_forecast(location: str, ctx: Context, days: int = 3) -> str:
+    """获取指定城市未来几天的天气预报（耗时较长，每算完一天通过进度通知推送当天结果）"""
+    condition, temperature = WEATHER_TABLE.get(location, DEFAULT_WEATHER)
+    lines = []
+    for day in range(1, days + 1):
+        # 模拟逐天计算的耗时
+        await asyncio.sleep(0.5)
+        lines.append(f"第{day}天 {condition}，{temperature + day - 1}°C")
+        # 客户端请求时带了 progressToken 才会真正发出通知
+        await ctx.report_progress(day, days, f"{location} {lines[-1]}")
+    return f"Mock天气预报: {location} " + "；".join(lines)
 
 if __name__ == "__main__":
     # 启动streamable-http服务器，默认端口8000
-    mcp.run(transport="streamable-http")
\ No newline at end of file
+    mcp.run(transport="streamable-http")
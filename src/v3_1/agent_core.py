@@ -7,6 +7,7 @@ from langgraph.graph import StateGraph, MessagesState, START, END
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, AIMessageChunk, AnyMessage
 from mock_llm import MockLLM
+from chunk_aggregator import ChunkAggregator
 import asyncio
 
 # 全局变量（确保工具和图实例正确共享）
@@ -54,13 +55,13 @@ async def call_model(state: AgentState) -> AsyncIterator[dict]:
     # print(f"call_model is called ... state={state}")
     """模型调用节点（支持流式输出）"""
 
-    collected_chunks = []
+    aggregator = ChunkAggregator()
     async for chunk in mock_llm.astream(state["messages"]):
         # 只有{}才会被合并 并更新到state["messages"]中去替换旧的message。这里需要注意的是。
         if isinstance(chunk.message, AIMessageChunk):
             # 输出格式：{"messages": [AIMessageChunk]}，确保状态合并
             yield {"messages": [chunk.message]}
-            collected_chunks.append(chunk.message)
+            aggregator.add(chunk.message)
 
         """
             下面这种做法有问题，我们不能在一个步骤中去处理state的messages字段，因为这个字段只会在最后一行代码运行结束后，将最后一次yield的结果放到messages中
@@ -71,17 +72,8 @@ async def call_model(state: AgentState) -> AsyncIterator[dict]:
         # merged_message = merge_chunks(collected_chunks)
         # state["messages"].append(merged_message)
 
-    s = ""
-    tool_calls = []
-    for chk in collected_chunks:
-        s += chk.content
-        if chk.tool_calls:
-            tool_calls = chk.tool_calls
-    # print(f"s={s}")
-    msg = AIMessage(content=s, additional_kwargs={'whole': True})
-    if tool_calls:
-        msg.tool_calls = tool_calls
-    yield {"messages": [msg]}
+    # 边收边聚合：content 最后 join 一次，tool_call_chunks 按 index 合并
+    yield {"messages": [aggregator.message(additional_kwargs={'whole': True})]}
 
 def should_continue(state: AgentState):
     # print(f"in should_conintue ... state={state}")
@@ -0,0 +1,83 @@
+"""
+chunk 聚合基准：对比 call_model 中几种把流式 AIMessageChunk 还原成完整消息的方式。
+  legacy:   收集到 list 后 s += chk.content，再扫描一遍找 tool_calls（原实现）
+  add:      逐个 AIMessageChunk.__add__ 累加
+  tree:     AIMessageChunk.__add__ 两两归并（树形 reduce）
+  aggregator: ChunkAggregator，边收边聚合
+用法: python bench_aggregator.py [chunk数...]
+"""
+import json
+import sys
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from chunk_aggregator import ChunkAggregator
+
+
+def make_chunks(n: int) -> list:
+    chunks = [AIMessageChunk(content="天气晴"[i % 3]) for i in range(n)]
+    args = json.dumps({"location": "上海"}, ensure_ascii=False)
+    # 工具调用参数也被切成多个片段，按 index 合并
+    chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+        {"name": "get_weather", "args": args[:5], "id": "tool_call_1", "index": 0}]))
+    chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+        {"name": None, "args": args[5:], "id": None, "index": 0}]))
+    return chunks
+
+
+def legacy(chunks):
+    collected = []
+    for chunk in chunks:
+        collected.append(chunk)
+    s = ""
+    tool_calls = []
+    for chk in collected:
+        s += chk.content
+        if chk.tool_calls:
+            tool_calls = chk.tool_calls
+    msg = AIMessage(content=s)
+    if tool_calls:
+        msg.tool_calls = tool_calls
+    return msg
+
+
+def add(chunks):
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged = merged + chunk
+    return merged
+
+
+def tree(chunks):
+    level = list(chunks)
+    while len(level) > 1:
+        level = [level[i] + level[i + 1] if i + 1 < len(level) else level[i] for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def aggregator(chunks):
+    agg = ChunkAggregator()
+    for chunk in chunks:
+        agg.add(chunk)
+    return agg.message()
+
+
+def run(name, fn, chunks):
+    start = time.perf_counter()
+    msg = fn(chunks)
+    elapsed = time.perf_counter() - start
+    args = msg.tool_calls[0]["args"] if msg.tool_calls else None
+    print(f"{name:>10}: {elapsed * 1000:9.1f}ms  len={len(msg.content)}  tool_call_args={args}")
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 50_000]
+    for n in sizes:
+        print(f"--- {n} chunks ---")
+        chunks = make_chunks(n)
+        for name, fn in [("legacy", legacy), ("add", add), ("tree", tree), ("aggregator", aggregator)]:
+            if name == "add" and n > 20_000:
+                print(f"{name:>10}: 跳过（二次方复杂度）")
+                continue
+            run(name, fn, chunks)
@@ -1,6 +1,7 @@
 import time
 import asyncio
 import uuid
+from functools import partial
 from typing import Iterator, AsyncIterator, List, Optional
 
 from langchain_core.language_models import BaseChatModel
@@ -17,20 +18,24 @@ class MockLLM(BaseChatModel):
     """支持工具调用 + 流式输出的 Mock LLM"""
 
     tools: list[BaseTool] = []
+    # True 时异步路径把阻塞的 _generate 放到线程池执行（模拟真正阻塞的后端）
+    offload_blocking: bool = False
 
     # --------------------------------------
     # 1️⃣ 同步生成（旧逻辑保持）
     # --------------------------------------
-    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+    def _respond(self, messages) -> tuple[AIMessage, float]:
+        """根据消息生成回复，返回 (回复, 需要模拟的延迟秒数)，本身不阻塞"""
         user_message = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
         tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
 
         if not user_message:
-            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="请输入问题"))])
+            return AIMessage(content="请输入问题"), 0
 
         content = user_message.content
         tool_calls = []
         response_content = ""
+        delay = 0
 
         if self.tools and not tool_messages:
             first_tool = self.tools[0]
@@ -40,15 +45,30 @@ class MockLLM(BaseChatModel):
                     "args": {"location": "上海"},
                     "id": "tool_call_1"
                 })
-                time.sleep(0.1)
+                delay = 0.1
                 response_content = f"将要调用{first_tool.name}工具查询信息..."
             else:
-                time.sleep(0.1)
+                delay = 0.1
                 response_content = f"你的问题我无法回答..."
         else:
             response_content = f"查询结果：{tool_messages[-1].content}" if tool_messages else "未找到信息"
 
-        message = AIMessage(content=response_content, tool_calls=tool_calls)
+        return AIMessage(content=response_content, tool_calls=tool_calls), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        """异步生成：等待期间让出事件循环，不会卡住同一事件循环中的其他请求"""
+        if self.offload_blocking:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(self._generate, messages, stop))
+        message, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
         return ChatResult(generations=[ChatGeneration(message=message)])
 
     # --------------------------------------
@@ -72,7 +92,7 @@ class MockLLM(BaseChatModel):
             yield ChatGenerationChunk(message=AIMessageChunk(content=ch))
 
         """异步流式输出：逐字返回 ChatGenerationChunk"""
-        result = self._generate(messages, **kwargs)
+        result = await self._agenerate(messages, **kwargs)
         full_text = result.generations[0].message.content
         tmp = None
         for ch in full_text:
@@ -94,6 +114,6 @@ class MockLLM(BaseChatModel):
         return "mock-minimal-stream-llm"
 
     def bind_tools(self, tools: list[BaseTool]):
-        new_instance = MockLLM()
+        new_instance = MockLLM(offload_blocking=self.offload_blocking)
         new_instance.tools = tools
         return new_instance
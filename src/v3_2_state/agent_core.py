@@ -3,6 +3,7 @@ from typing import TypedDict, Annotated
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage
 from mock_llm import MockLLM
+from chunk_aggregator import ChunkAggregator
 
 
 class AgentState(TypedDict):
@@ -16,16 +17,12 @@ async def call_model_1(state: AgentState):
     print(f"before call_model_1, state={state}")
     """节点1：流式调用模型"""
 
-    collected_chunks = []
+    aggregator = ChunkAggregator()
 
     async for chunk in llm.astream([HumanMessage(content="1")]):
         yield {"messages": [chunk]}
         print(f"in call_model_1, state={state}")
-        collected_chunks.append(chunk)
-
-    s = ""
-    for chk in collected_chunks:
-        s += chk.content
+        aggregator.add(chunk)
 
     """
         1. Agent中的某个node和LLM交互，如果model输出是by token的Chunk，那么node结束时会只会将最后一个Chunk写到State的messages中，这是一个问题
@@ -34,7 +31,7 @@ async def call_model_1(state: AgentState):
         3. 整个过程中，分块的chunk输出了，最后完整的content也输出了一次，那么Agent的客户端会收到冗余的信息，为了让客户端区分分块的和完整的，
         可以在完整的AIMessage中设置一些属性，便于客户端进行过滤
     """
-    yield {"messages": [AIMessage(content=s, additional_kwargs={'whole':True})]}
+    yield {"messages": [aggregator.message(additional_kwargs={'whole': True})]}
 
     print(f"after call_model_1, state={state}")
 
@@ -0,0 +1,63 @@
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.utils.json import parse_partial_json
+
+
+class ChunkAggregator:
+    """把模型流式输出的 AIMessageChunk 聚合成一个完整的 AIMessage，整体是线性时间：
+
+    - content 先放进 list，最后 join 一次，避免 s += chunk.content 反复拷贝
+    - tool_call_chunks 按 index（没有 index 时按 id）边收边合并，args 片段同样最后再拼接，不需要第二遍扫描
+    """
+
+    def __init__(self):
+        self._parts: List[str] = []
+        self._tool_calls: Dict[object, dict] = {}
+
+    def add(self, chunk: AIMessageChunk) -> None:
+        content = chunk.content
+        if isinstance(content, str):
+            if content:
+                self._parts.append(content)
+        else:
+            self._parts.extend(block if isinstance(block, str) else block.get("text", "") for block in content)
+
+        if not chunk.tool_call_chunks:
+            return
+        for tc in chunk.tool_call_chunks:
+            key = tc.get("index")
+            if key is None:
+                key = tc.get("id") or len(self._tool_calls)
+            entry = self._tool_calls.get(key)
+            if entry is None:
+                entry = self._tool_calls[key] = {"name": "", "id": None, "args": []}
+            if tc.get("name"):
+                entry["name"] += tc["name"]
+            if tc.get("id") and entry["id"] is None:
+                entry["id"] = tc["id"]
+            if tc.get("args"):
+                entry["args"].append(tc["args"])
+
+    @property
+    def content(self) -> str:
+        return "".join(self._parts)
+
+    def message(self, additional_kwargs: Optional[dict] = None) -> AIMessage:
+        tool_calls, invalid_tool_calls = [], []
+        for entry in self._tool_calls.values():
+            raw_args = "".join(entry["args"])
+            try:
+                args = parse_partial_json(raw_args) if raw_args else {}
+            except ValueError:
+                args = None
+            if isinstance(args, dict):
+                tool_calls.append({"name": entry["name"], "args": args, "id": entry["id"]})
+            else:
+                invalid_tool_calls.append({"name": entry["name"], "args": raw_args, "id": entry["id"], "error": None})
+        return AIMessage(
+            content=self.content,
+            additional_kwargs=additional_kwargs or {},
+            tool_calls=tool_calls,
+            invalid_tool_calls=invalid_tool_calls,
+        )
@@ -31,14 +31,19 @@ async def stream_agent_response(session_id: str, query: str) -> AsyncGenerator[s
     # 获取会话历史
     chat_history = session_store[session_id].copy()
     input_messages = chat_history + [{"role": "user", "content": query}]
+    final_state = None
     final_messages = None
 
     try:
-        # 1. 流式执行 LangGraph，实时返回中间步骤
-        async for step in graph.astream({
+        # 1. 单次流式执行 LangGraph：updates 返回中间步骤，values 记录最终状态（不再二次 ainvoke）
+        async for mode, chunk in graph.astream({
             "messages": input_messages,
             "session_id": session_id
-        }):
+        }, stream_mode=["updates", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+            step = chunk
             # 模型推理步骤
             if "call_model" in step:
                 msg = step["call_model"]["messages"][0]
@@ -48,9 +53,7 @@ async def stream_agent_response(session_id: str, query: str) -> AsyncGenerator[s
                     'content': msg.content,
                     'session_id': session_id
                 })}\n\n"""
-                # 同步更新临时消息列表（用于最终历史存储）
-                chat_history.append(msg)
-                # 工具调用步骤
+            # 工具调用步骤
             elif "tools" in step:
                 msg = step["tools"]["messages"][0]
                 yield f"""data: {json.dumps({
@@ -58,15 +61,8 @@ async def stream_agent_response(session_id: str, query: str) -> AsyncGenerator[s
                     'content': f'工具返回: {msg.content}',
                     'session_id': session_id
                 })}\n\n"""
-        chat_history.append(msg)
-
-        # 2. 获取最终结果并返回
-        final_state = await graph.ainvoke(
-            {
-                "messages": input_messages,
-                "session_id": session_id
-            }
-        )
+
+        # 2. 最后一次 values 即为最终状态
         final_msg = final_state["messages"][-1]
         final_messages = final_state["messages"]  # 用于更新会话历史
 
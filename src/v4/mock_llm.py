@@ -1,4 +1,6 @@
+import asyncio
 import time
+from functools import partial
 
 from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
@@ -9,17 +11,22 @@ from langchain_core.tools import BaseTool
 class MockLLM(BaseChatModel):
     # 存储通过bind_tools绑定的工具列表
     tools: list[BaseTool] = []
+    # True 时异步路径把阻塞的 _generate 放到线程池执行（模拟真正阻塞的后端）；
+    # 默认异步路径用 asyncio.sleep 模拟延迟，不占用事件循环也不占用线程
+    offload_blocking: bool = False
 
-    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+    def _respond(self, messages) -> tuple[AIMessage, float]:
+        """根据消息生成回复，返回 (回复, 需要模拟的延迟秒数)，本身不阻塞"""
         # 提取最新用户消息和工具返回结果
         user_message = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
         tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
 
         if not user_message:
-            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="请输入问题"))])
+            return AIMessage(content="请输入问题"), 0
 
         content = user_message.content
         tool_calls = []
+        delay = 0
 
         # 关键逻辑：如果有绑定的工具且未收到工具返回结果，则调用第一个工具
         if self.tools and not tool_messages:
@@ -32,10 +39,10 @@ class MockLLM(BaseChatModel):
                     "args": {"location": "上海"},  # 工具参数（可根据工具schema动态生成）
                     "id": "tool_call_1"
                 })
-                time.sleep(2)
+                delay = 2
                 response_content = f"正在调用{first_tool.name}工具查询信息..."
             else:
-                time.sleep(2)
+                delay = 2
                 response_content = f"你的问题我无法回答..."
         else:
             # 工具调用完成，返回最终结果
@@ -45,6 +52,22 @@ class MockLLM(BaseChatModel):
             content=response_content,
             tool_calls=tool_calls
         )
+        return message, delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        """异步生成：等待期间让出事件循环，多个会话可以并发执行"""
+        if self.offload_blocking:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(self._generate, messages, stop))
+        message, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
         return ChatResult(generations=[ChatGeneration(message=message)])
 
     @property
@@ -53,6 +76,6 @@ class MockLLM(BaseChatModel):
 
     # 实现bind_tools方法，用于将工具绑定到模型
     def bind_tools(self, tools: list[BaseTool]):
-        new_instance = MockLLM()
+        new_instance = MockLLM(offload_blocking=self.offload_blocking)
         new_instance.tools = tools  # 存储绑定的工具
         return new_instance
\ No newline at end of file
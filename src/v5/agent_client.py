@@ -1,22 +1,70 @@
 import aiohttp
 import asyncio
-import json
-from typing import AsyncGenerator, Dict
+import time
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from sse import SSEDecoder
 
 
 class AgentClient:
-    def __init__(self, server_url: str = "http://localhost:8001"):
+    """Agent 服务客户端，内部持有一个长连接复用的 aiohttp.ClientSession
+
+    - limit: 连接池总连接数上限
+    - limit_per_host: 单个 host 的连接数上限（0 表示不限制）
+    - keepalive_timeout: 空闲连接保活时间（秒）
+
+    建议用 `async with AgentClient() as client:` 管理生命周期，或在结束时调用 `await client.close()`。
+    """
+
+    def __init__(self, server_url: str = "http://localhost:8001", limit: int = 100, limit_per_host: int = 0,
+                 keepalive_timeout: float = 30):
         self.server_url = server_url
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """懒加载共享的 ClientSession，所有请求复用同一个连接池"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AgentClient":
+        self._get_session()
+        return self
 
-    async def invoke_stream(self, session_id: str, query: str, stream: bool) -> AsyncGenerator[Dict, None]:
-        """流式调用Agent（适配 SSE 格式）"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def invoke_stream(self, session_id: str, query: str, stream: bool, mode: str = "node",
+                            timings: Optional[Dict] = None) -> AsyncGenerator[Dict, None]:
+        """流式调用Agent（适配 SSE 格式），mode="token" 时逐 token 接收模型输出
+
+        连接中途断开（或流在 [DONE] 之前结束）时产出一个 error 事件后结束，不自动重连：
+        服务端不支持续传，重新 POST 会把整轮对话（包括工具调用和历史追加）再执行一遍。
+        传入 timings 时，收到响应头的时刻（time.perf_counter()）记录在 timings["headers"]，供压测统计 TTFB。
+        """
+        decoder = SSEDecoder()
+        try:
+            async with self._get_session().post(
                 f"{self.server_url}/agent/invoke",
-                json={"session_id": session_id, "query": query, "stream": stream},
+                json={"session_id": session_id, "query": query, "stream": stream, "mode": mode},
                 timeout=None,  # 禁用超时（适应长耗时工具调用）
                 headers={"Accept": "text/event-stream"}  # 告诉服务端需要 SSE 格式
             ) as resp:
+                if timings is not None:
+                    timings.setdefault("headers", time.perf_counter())
                 if resp.status != 200:
                     yield {
                         "type": "error",
@@ -25,67 +73,79 @@ class AgentClient:
                     }
                     return
 
-                # 逐行读取 SSE 数据
-                async for line in resp.content:
-                    line_str = line.strip().decode("utf-8")
-                    if not line_str:
-                        continue  # 忽略空行
-
-                    # 解析 SSE 格式（只处理 "data:" 开头的行）
-                    if line_str.startswith("data:"):
-                        data = line_str[len("data:"):].strip()
-                        if data == "[DONE]":
-                            break  # 流结束标记
-
+                # 按原始字节块增量解码 SSE 事件
+                async for raw in resp.content.iter_any():
+                    for event in decoder.feed(raw):
+                        if event.data == "[DONE]":
+                            return  # 流结束标记
                         try:
-                            chunk = json.loads(data)
-                            yield chunk
-                        except json.JSONDecodeError:
+                            yield event.json()
+                        except ValueError:
                             yield {
                                 "type": "error",
-                                "content": f"解析流式数据失败：{data}",
+                                "content": f"解析流式数据失败：{event.data}",
                                 "session_id": session_id
                             }
+                error = "流式响应在结束标记之前关闭"
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError) as e:
+            error = f"连接中断：{type(e).__name__}: {e}"
+        yield {"type": "error", "content": error, "session_id": session_id}
 
     async def invoke(self, session_id: str, query: str) -> Dict:
         """非流式调用Agent（保持不变）"""
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.server_url}/agent/invoke",
-                json={"session_id": session_id, "query": query, "stream": False}
-            ) as resp:
-                if resp.status != 200:
-                    return {
-                        "error": f"请求失败，状态码：{resp.status}",
-                        "session_id": session_id
-                    }
-                return await resp.json()
+        async with self._get_session().post(
+            f"{self.server_url}/agent/invoke",
+            json={"session_id": session_id, "query": query, "stream": False}
+        ) as resp:
+            if resp.status != 200:
+                return {
+                    "error": f"请求失败，状态码：{resp.status}",
+                    "session_id": session_id
+                }
+            return await resp.json()
 
     async def get_history(self, session_id: str) -> Dict:
         """获取会话历史（保持不变）"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"{self.server_url}/agent/history/{session_id}"
-            ) as resp:
-                if resp.status != 200:
-                    return {
-                        "error": f"获取历史失败，状态码：{resp.status}",
-                        "session_id": session_id
-                    }
-                return await resp.json()
+        async with self._get_session().get(
+            f"{self.server_url}/agent/history/{session_id}"
+        ) as resp:
+            if resp.status != 200:
+                return {
+                    "error": f"获取历史失败，状态码：{resp.status}",
+                    "session_id": session_id
+                }
+            return await resp.json()
+
+    async def invoke_many(self, queries: List[Tuple[str, str]], concurrency: int = 10) -> List[List[Dict]]:
+        """并发执行多个 (session_id, query)，最多同时 concurrency 个请求，按输入顺序返回每个请求的全部事件"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(session_id: str, query: str) -> List[Dict]:
+            async with semaphore:
+                return [chunk async for chunk in self.invoke_stream(session_id, query, True)]
+
+        return await asyncio.gather(*(run_one(session_id, query) for session_id, query in queries))
 
 
 # 示例使用（保持不变）
 async def main():
-    client = AgentClient()
+    async with AgentClient() as client:
+        await run_demo(client)
+
+
+async def run_demo(client: AgentClient):
     session_id = "test_session_123"
 
     print("===== 流式调用结果 =====")
     async for chunk in client.invoke_stream(session_id, "今天天气怎么样？", True):
         if chunk["type"] == "model":
             print(f"🤖 模型推理：{chunk['content']}", flush=True)
+        elif chunk["type"] == "token":
+            print(chunk["content"], end="", flush=True)
         elif chunk["type"] == "tool":
             print(f"🔧 {chunk['content']}")
+        elif chunk["type"] == "tool_progress":
+            print(f"⏳ {chunk['tool']} [{chunk['progress']:g}/{chunk['total']:g}] {chunk['content']}", flush=True)
         elif chunk["type"] == "result":
             print(f"✅ 最终回答：{chunk['content']}", flush=True)
         else:
@@ -1,59 +1,226 @@
 from langchain_core.tools import BaseTool
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.callbacks import CallbackContext, Callbacks
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, MessagesState, START, END
+from langgraph.graph.state import CompiledStateGraph
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from context_window import ContextWindow
 from mock_llm import MockLLM
-import asyncio
+from latency_model import LatencyModel
+from tool_batching import batch_tools
+from tool_cache import ToolResultCache, cache_tool
+from tool_limits import ToolLimit, format_tool_error, limit_tool, limit_tools
+from tool_registry import ToolIndex, ToolRegistry
+from collections import OrderedDict
+import hashlib
+import json
+import os
+
+# MCP 服务器连接配置，可用 AGENT_MCP_SERVERS（JSON，服务器名 -> 连接配置）替换
+MCP_CONNECTIONS = json.loads(os.environ.get("AGENT_MCP_SERVERS", "null")) or {
+    "weather": {
+        "url": "http://localhost:8000/mcp",
+        "transport": "streamable_http",
+    }
+}
+# 每个 MCP 服务器保持的长连接会话数，0 表示每次工具调用新建会话
+MCP_POOL_SIZE = int(os.environ.get("AGENT_MCP_POOL_SIZE", "2"))
+# 工具清单的磁盘缓存目录，进程启动时优先从这里加载，不必连接所有 MCP 服务器
+MCP_MANIFEST_DIR = os.environ.get("AGENT_MCP_MANIFEST_DIR", ".mcp_manifests")
+# 每个请求最多绑定给模型的工具数（按问题检索相关工具），0 表示绑定全部工具
+TOOL_TOP_K = int(os.environ.get("AGENT_TOOL_TOP_K", "8"))
+
+# 上下文窗口：每轮最多把 AGENT_CONTEXT_MAX_TOKENS 个 token 的最近对话原样交给模型（0 表示不裁剪），
+# 更早的对话压缩成不超过 AGENT_CONTEXT_SUMMARY_TOKENS 的摘要
+context_window = ContextWindow(max_tokens=int(os.environ.get("AGENT_CONTEXT_MAX_TOKENS", "4000")),
+                               summary_tokens=int(os.environ.get("AGENT_CONTEXT_SUMMARY_TOKENS", "500")))
 
 # 全局变量（确保工具和图实例正确共享）
-mcp_client = None
 loaded_tools: list[BaseTool] = []  # 重命名为loaded_tools，避免与其他变量冲突
 mock_llm = None
 graph = None
+# 当前工具清单的版本（名称/描述/参数schema的哈希），用作编译图缓存的key
+tools_version = ""
+graph_cache: dict[str, CompiledStateGraph] = {}
+# 按名称 / 描述检索工具，随工具清单一起重建
+tool_index: ToolIndex | None = None
+# 工具子集（工具名元组）-> 绑定了这些工具的模型，LRU，工具清单变化时清空
+BOUND_MODEL_CACHE_SIZE = int(os.environ.get("AGENT_BOUND_MODEL_CACHE_SIZE", "256"))
+bound_models: "OrderedDict[tuple[str, ...], MockLLM]" = OrderedDict()
+bound_model_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# MockLLM 的延迟模型，压测时通过环境变量 MOCK_LLM_PROFILE 配置（预设名或 JSON），未配置则使用固定延迟
+llm_latency_model = LatencyModel.from_env()
+# 工具调用限制：默认每个工具最多 AGENT_TOOL_CONCURRENCY 个并发调用、每次 AGENT_TOOL_TIMEOUT 秒超时；
+# AGENT_TOOL_LIMITS 可按工具名覆盖，例如 '{"get_weather": {"max_concurrency": 4, "timeout": 5}}'
+default_tool_limit = ToolLimit(max_concurrency=int(os.environ.get("AGENT_TOOL_CONCURRENCY", "8")),
+                               timeout=float(os.environ.get("AGENT_TOOL_TIMEOUT", "10")))
+tool_limit_overrides = {name: ToolLimit(**limit)
+                        for name, limit in json.loads(os.environ.get("AGENT_TOOL_LIMITS", "{}")).items()}
+# 并发的 get_weather 调用在 AGENT_TOOL_BATCH_WAIT_MS 毫秒内合并为一次 get_weather_batch，负数表示不合并
+TOOL_BATCH_WAIT_MS = float(os.environ.get("AGENT_TOOL_BATCH_WAIT_MS", "2"))
+# 工具结果缓存：AGENT_TOOL_CACHE_TTLS 为各工具的 TTL（秒），未列出的工具不缓存
+tool_result_cache = ToolResultCache(
+    max_entries=int(os.environ.get("AGENT_TOOL_CACHE_SIZE", "1024")),
+    ttls=json.loads(os.environ.get("AGENT_TOOL_CACHE_TTLS", '{"get_weather": 60}')),
+)
+
+
+def tools_manifest_hash(tools: list[BaseTool]) -> str:
+    """计算工具清单哈希，清单不变则哈希不变"""
+    manifest = [
+        {"name": t.name, "description": t.description, "args": t.args}
+        for t in sorted(tools, key=lambda t: t.name)
+    ]
+    payload = json.dumps(manifest, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_tools(tools: list[BaseTool]) -> bool:
+    """载入工具并绑定到LLM；清单未变化时直接返回False，保留已绑定的模型和已编译的图"""
+    global loaded_tools, mock_llm, tools_version, tool_index
+    version = tools_manifest_hash(tools)
+    if version == tools_version:
+        return False
+
+    loaded_tools = tools
+    mock_llm = MockLLM(latency_model=llm_latency_model).bind_tools(loaded_tools)
+    tool_index = ToolIndex(loaded_tools)
+    bound_models.clear()
+    tools_version = version
+    graph_cache.clear()
+    # 工具定义变了，旧结果不再可信
+    tool_result_cache.clear()
+    return True
+
+
+async def relay_tool_progress(progress: float, total: float | None, message: str | None,
+                              context: CallbackContext):
+    """MCP 进度通知 -> LangGraph custom 流，agent_server 把它作为 tool_progress 事件推给客户端"""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        # 不在图的执行上下文中（例如直接调用工具），忽略
+        return
+    writer({"type": "tool_progress", "tool": context.tool_name, "progress": progress, "total": total,
+            "content": message or ""})
+
+
+mcp_callbacks = Callbacks(on_progress=relay_tool_progress)
+
+
+# 多服务器工具注册表：清单缓存在磁盘，会话池在第一次调用该服务器的工具时才连接
+tool_registry = ToolRegistry(MCP_CONNECTIONS, cache_dir=MCP_MANIFEST_DIR, pool_size=MCP_POOL_SIZE,
+                             callbacks=mcp_callbacks)
+
+
+async def close_mcp():
+    """关闭会话池中的长连接（进程退出时调用）"""
+    await tool_registry.close()
 
 
 async def init_mcp():
-    """初始化MCP并验证工具加载"""
-    global mcp_client, loaded_tools, mock_llm
+    """加载工具清单并绑定工具，可重复调用以刷新工具清单
+
+    首次调用先读磁盘缓存，只连接没有缓存的服务器；之后的调用（后台定时刷新）才连接所有服务器拉取清单，
+    清单哈希不变时不重新绑定工具、不重新编译图
+    """
     try:
-        mcp_client = MultiServerMCPClient({
-            "weather": {
-                "url": "http://localhost:8000/mcp",
-                "transport": "streamable_http",
-            }
-        })
-
-        # 强制获取工具并验证
-        loaded_tools = await mcp_client.get_tools()
-        if not loaded_tools:
+        if not tool_registry.versions:
+            cached = tool_registry.load_cached()
+            missing = [server for server in MCP_CONNECTIONS if server not in tool_registry.versions]
+            if missing:
+                await tool_registry.refresh(missing)
+            source = f"磁盘缓存 {cached} 个服务器" if cached else "MCP服务器"
+        else:
+            await tool_registry.refresh()
+            source = "MCP服务器"
+        if not tool_registry.entries:
             raise ValueError("MCP服务器未返回任何工具，请检查服务器端工具注册")
 
-        # 打印工具详情，确认工具名称正确
-        print("成功加载MCP工具:")
-        for tool in loaded_tools:
-            print(f"- 名称: {tool.name}, 描述: {tool.description}")
+        if not load_tools(tool_registry.tools()):
+            return False
 
-        # 绑定工具到LLM
-        mock_llm = MockLLM().bind_tools(loaded_tools)
+        print(f"成功加载MCP工具 (version={tools_version[:12]}, 来源: {source}): "
+              f"{len(MCP_CONNECTIONS)} 个服务器, {len(loaded_tools)} 个工具")
+        return True
 
     except Exception as e:
         print(f"MCP初始化失败: {str(e)}")
         raise
 
 
+def bind_selected(names: tuple[str, ...]):
+    """返回只绑定了 names 这些工具的模型，相同的工具子集复用同一个实例"""
+    model = bound_models.get(names)
+    if model is not None:
+        bound_model_stats["hits"] += 1
+        bound_models.move_to_end(names)
+        return model
+    bound_model_stats["misses"] += 1
+    selected = set(names)
+    model = bound_models[names] = mock_llm.bind_tools([t for t in loaded_tools if t.name in selected])
+    while len(bound_models) > BOUND_MODEL_CACHE_SIZE:
+        bound_models.popitem(last=False)
+        bound_model_stats["evictions"] += 1
+    return model
+
+
+def select_tools(messages: list[BaseMessage]):
+    """按最新的用户问题用 BM25 检索最相关的 TOOL_TOP_K 个工具，返回只绑定了这些工具的模型"""
+    if TOOL_TOP_K <= 0 or len(loaded_tools) <= TOOL_TOP_K or tool_index is None:
+        return mock_llm
+    query = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    names = tuple(tool_index.lookup(str(query), TOOL_TOP_K))
+    if not names:
+        # 没有相关工具时仍绑定全部工具，交给模型判断
+        return mock_llm
+    return bind_selected(names)
+
+
 class AgentState(MessagesState):
     session_id: str
+    # 窗口之外的历史对话摘要
+    summary: str
+
+
+async def manage_context(state: AgentState):
+    """上下文管理节点：只保留预算内的最近几轮对话，更早的消息并入会话摘要"""
+    messages = state["messages"]
+    start = context_window.split(messages)
+    if start == 0:
+        return {}
+    summary = await context_window.summarize(state.get("session_id", ""), messages[:start])
+    # 用窗口内的消息替换整个消息列表，本轮后续的节点（包括工具循环）都只处理窗口
+    return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages[start:]], "summary": summary}
 
 
 async def call_model(state: AgentState):
     """模型调用节点（增加工具存在性检查）"""
     if not loaded_tools:
         raise RuntimeError("工具列表为空，请检查MCP连接")
-    response = await mock_llm.ainvoke(state["messages"])
+    messages = state["messages"]
+    if state.get("summary"):
+        messages = [SystemMessage(content=f"此前对话的摘要：\n{state['summary']}"), *messages]
+    response = await select_tools(messages).ainvoke(messages)
     return {"messages": [response]}
 
 
+def wrap_tools(tools: list[BaseTool]) -> list[BaseTool]:
+    """给工具加上结果缓存、批量合并、并发上限和超时，返回交给 ToolNode 的工具列表
+
+    缓存在最外层：命中缓存的调用既不参与合并也不占用并发名额。
+    合并后的单个工具（如 get_weather）改为调用批量工具，原来包在它外面的限制随之失效，
+    所以再按它自己的 ToolLimit 包一层：并发上限限制同时等待合并的调用数，超时覆盖等待合并和批量调用的全过程；
+    批量工具本身的限制仍作用于每次批量调用
+    """
+    limited = limit_tools(tools, default_tool_limit, tool_limit_overrides)
+    batched = [t if t is original else limit_tool(t, tool_limit_overrides.get(t.name, default_tool_limit))
+               for t, original in zip(batch_tools(limited, max_wait_ms=TOOL_BATCH_WAIT_MS), limited)]
+    return [cache_tool(t, tool_result_cache) for t in batched]
+
+
 def build_graph():
     """构建图时显式传递工具列表"""
     global graph
@@ -61,12 +228,15 @@ def build_graph():
         raise RuntimeError("构建图失败：工具列表为空")
 
     # 关键修正：显式用loaded_tools创建ToolNode，确保工具被正确传入
-    tool_node = ToolNode(loaded_tools)
+    # 同一轮的多个 tool_calls 并发执行，单个调用失败转成错误结果而不中断整轮
+    tool_node = ToolNode(wrap_tools(loaded_tools), handle_tool_errors=format_tool_error)
 
     builder = StateGraph(AgentState)
+    builder.add_node("manage_context", manage_context)
     builder.add_node("call_model", call_model)
     builder.add_node("tools", tool_node)
-    builder.add_edge(START, "call_model")
+    builder.add_edge(START, "manage_context")
+    builder.add_edge("manage_context", "call_model")
     builder.add_conditional_edges(
         "call_model",
         lambda state: "tools" if state["messages"][-1].tool_calls else END
@@ -74,4 +244,13 @@ def build_graph():
     builder.add_edge("tools", "call_model")
 
     graph = builder.compile()
-    return graph
\ No newline at end of file
+    return graph
+
+
+def get_graph() -> CompiledStateGraph:
+    """按工具清单版本缓存编译后的图，只有清单变化后才会重新编译"""
+    cached = graph_cache.get(tools_version)
+    if cached is None:
+        graph_cache.clear()
+        cached = graph_cache[tools_version] = build_graph()
+    return cached
\ No newline at end of file
@@ -1,16 +1,53 @@
-import json
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional, AsyncGenerator
 import asyncio
-from collections import defaultdict
-from agent_core import init_mcp, build_graph, AgentState
-from langchain_core.messages import BaseMessage
+import os
+import time
+from contextlib import asynccontextmanager
+from agent_core import init_mcp, close_mcp, get_graph, AgentState, tool_registry, tool_result_cache, \
+    bound_models, bound_model_stats, context_window
+from coalesce import coalesce_tokens
+from metrics import instrument_stream, metrics_handler, render as render_metrics
+from tracing import TracingMiddleware, traced_dumps, tracing_callbacks
+from session_store import SessionStore, InMemorySessionStore, RedisSessionStore
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
 # 新增 CORS 支持
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="MCP Agent Server")
+# token 流合并的默认参数（可按请求覆盖）
+COALESCE_MAX_DELAY_MS = 20
+COALESCE_MAX_BYTES = 512
+
+# 后台刷新工具清单的间隔（秒），清单哈希变化时才会重新绑定工具并重新编译图
+TOOLS_REFRESH_INTERVAL = 60
+
+
+async def refresh_tools_periodically():
+    while True:
+        await asyncio.sleep(TOOLS_REFRESH_INTERVAL)
+        try:
+            await init_mcp()
+        except Exception:
+            # 刷新失败时继续使用已加载的工具和图
+            pass
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 进程启动时只初始化一次 MCP 客户端并编译图，请求路径上不再做工具发现和图编译
+    await init_mcp()
+    get_graph()
+    refresher = asyncio.create_task(refresh_tools_periodically())
+    try:
+        yield
+    finally:
+        refresher.cancel()
+        await close_mcp()
+
+
+app = FastAPI(title="MCP Agent Server", lifespan=lifespan)
 
 # 配置 CORS - 允许前端跨域访问
 app.add_middleware(
@@ -21,76 +58,196 @@ app.add_middleware(
     allow_headers=["*"],  # 允许所有请求头
 )
 
-# 内存会话存储：session_id -> chat_history
-session_store: Dict[str, List[BaseMessage]] = defaultdict(list)
+# 请求级链路追踪（默认关闭）：AGENT_TRACE_SAMPLE_RATE 为采样率，AGENT_TRACE_EXPORT 为 JSONL 文件路径或 OTLP 地址
+app.add_middleware(TracingMiddleware)
+
+# 会话存储后端：memory 仅适用于单 worker；sqlite 为多 worker 共享的本地文件（Redis 兼容接口）
+SESSION_BACKEND = os.environ.get("AGENT_SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.environ.get("AGENT_SESSION_DB", "sessions.db")
+
+
+def create_session_store() -> SessionStore:
+    if SESSION_BACKEND == "sqlite":
+        from sqlite_redis import SqliteRedis
+        return RedisSessionStore(SqliteRedis(SESSION_DB_PATH), ttl_seconds=1800, max_messages=200)
+    if SESSION_BACKEND == "redis":
+        import redis
+        client = redis.Redis.from_url(os.environ.get("AGENT_REDIS_URL", "redis://localhost:6379/0"),
+                                      decode_responses=True)
+        return RedisSessionStore(client, ttl_seconds=1800, max_messages=200)
+    # 内存会话存储：session_id -> chat_history（LRU + 空闲 TTL 淘汰，单会话消息数有上限）
+    return InMemorySessionStore(max_sessions=1000, ttl_seconds=1800, max_messages=200)
+
+
+session_store: SessionStore = create_session_store()
 
 # 请求模型
 class AgentRequest(BaseModel):
     session_id: str
     query: str
     stream: bool = True  # 是否流式输出
+    mode: str = "node"  # node: 每个节点输出一个事件；token: 逐 token 推送模型输出
+    # token 模式下的合并参数：最多攒 coalesce_ms 毫秒或 coalesce_bytes 字节再发一帧，coalesce_ms=0 表示不合并
+    coalesce_ms: float = COALESCE_MAX_DELAY_MS
+    coalesce_bytes: int = COALESCE_MAX_BYTES
+
+
+def format_sse(payload: dict) -> str:
+    return f"data: {traced_dumps(payload)}\n\n"
+
+
+def error_payload(e: Exception, session_id: str) -> dict:
+    payload = {'type': 'error', 'content': f'{type(e).__name__}: {e}', 'session_id': session_id}
+    if getattr(e, 'retry_after', None) is not None:
+        payload['retry_after'] = e.retry_after
+    return payload
+
 
 # 流式响应生成器
 async def stream_agent_response(session_id: str, query: str) -> AsyncGenerator[str, None]:
-    await init_mcp()
-    graph = build_graph()
+    graph = get_graph()
 
-    # 获取会话历史
-    chat_history = session_store[session_id].copy()
-    input_messages = chat_history + [{"role": "user", "content": query}]
-    final_messages = None
+    # 获取会话历史（只读，本轮新增的消息单独收集，结束时追加写入）
+    chat_history = await session_store.aget(session_id)
+    user_message = HumanMessage(content=query)
+    new_messages: List[BaseMessage] = [user_message]
+    completed = False
 
     try:
-        # 流式执行 LangGraph
-        async for step in graph.astream({
-            "messages": input_messages,
+        # 单次执行 LangGraph：从 updates 中收集本轮新增消息，最后一条即为最终结果；
+        # custom 流中是工具执行过程中转发的 MCP 进度通知
+        async for mode, step in graph.astream({
+            "messages": [*chat_history, user_message],
             "session_id": session_id
-        }):
+        }, config={"callbacks": [metrics_handler, *tracing_callbacks()]}, stream_mode=["updates", "custom"]):
+            if mode == "custom":
+                if step.get("type") == "tool_progress":
+                    yield format_sse({**step, 'session_id': session_id})
+                continue
             # 模型推理步骤
             if "call_model" in step and step["call_model"] is not None:
                 msg = step["call_model"]["messages"][0]
-                yield f"""data: {json.dumps({
+                yield format_sse({
                     'type': 'model',
                     'content': msg.content,
                     'session_id': session_id
-                })}\n\n"""
-                chat_history.append(msg)
+                })
+                new_messages.extend(step["call_model"]["messages"])
             # 工具调用步骤
             elif "tools" in step and step["tools"] is not None:
-                msg = step["tools"]["messages"][0]
-                yield f"""data: {json.dumps({
-                    'type': 'tool',
-                    'content': f'工具返回: {msg.content}',
-                    'session_id': session_id
-                })}\n\n"""
-                chat_history.append(msg)
+                # 一轮可能并发执行了多个工具调用，每个结果一个事件
+                for msg in step["tools"]["messages"]:
+                    yield format_sse({
+                        'type': 'tool',
+                        'content': f'工具返回: {msg.content}',
+                        'session_id': session_id
+                    })
+                new_messages.extend(step["tools"]["messages"])
 
-        # 获取最终结果
-        final_state = await graph.ainvoke({
-            "messages": input_messages,
-            "session_id": session_id
-        })
-        final_msg = final_state["messages"][-1]
-        final_messages = final_state["messages"]
+        final_msg = new_messages[-1]
+        completed = True
 
         # 返回最终结果
-        yield f"""data: {json.dumps({
+        yield format_sse({
             'type': 'result',
             'content': final_msg.content,
             'session_id': session_id
-        })}\n\n"""
+        })
 
         # 标记流结束
         yield "data: [DONE]\n\n"
+    except Exception as e:
+        # 模型 / 工具出错（包括 MockLLM 注入的错误、超时、限流）时以 error 事件结束本次流
+        yield format_sse(error_payload(e, session_id))
+        yield "data: [DONE]\n\n"
+    finally:
+        if completed:
+            await session_store.aappend(session_id, new_messages)
+
+# token 级事件生成器：由 astream_events 驱动，模型每产生一个 AIMessageChunk 就产出一个 token 事件
+async def agent_token_events(session_id: str, query: str) -> AsyncGenerator[dict, None]:
+    graph = get_graph()
+
+    chat_history = await session_store.aget(session_id)
+    user_message = HumanMessage(content=query)
+    new_messages: List[BaseMessage] = [user_message]
+    completed = False
+    start = time.perf_counter()
+    ttft_ms = None
+
+    try:
+        async for event in graph.astream_events({
+            "messages": [*chat_history, user_message],
+            "session_id": session_id
+        }, config={"callbacks": [metrics_handler, *tracing_callbacks()]}, version="v2",
+                stream_mode=["updates", "custom"]):
+            kind = event["event"]
+            # 模型输出的增量 chunk
+            if kind == "on_chat_model_stream":
+                chunk = event["data"]["chunk"]
+                # 跳过聚合后的完整消息（additional_kwargs={'whole': True}），只转发增量
+                if chunk.additional_kwargs.get("whole") or not isinstance(chunk, AIMessageChunk):
+                    continue
+                if not chunk.content:
+                    continue
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                yield {'type': 'token', 'content': chunk.content, 'session_id': session_id}
+            # 图根节点的输出：updates 中收集本轮新增消息、工具结果整条推送；custom 中为工具进度
+            elif kind == "on_chain_stream" and not event["parent_ids"]:
+                mode, chunk = event["data"]["chunk"]
+                if mode == "custom":
+                    if chunk.get("type") == "tool_progress":
+                        yield {**chunk, 'session_id': session_id}
+                    continue
+                for node, update in chunk.items():
+                    # manage_context 只是裁剪本次执行的上下文，不是本轮新增的消息
+                    if node == "manage_context" or not update or "messages" not in update:
+                        continue
+                    new_messages.extend(update["messages"])
+                    if node == "tools":
+                        for msg in update["messages"]:
+                            yield {
+                                'type': 'tool',
+                                'content': f'工具返回: {msg.content}',
+                                'session_id': session_id
+                            }
+
+        completed = True
+        yield {
+            'type': 'result',
+            'content': new_messages[-1].content,
+            'session_id': session_id,
+            'ttft_ms': ttft_ms,
+            'total_ms': (time.perf_counter() - start) * 1000
+        }
+    except Exception as e:
+        yield error_payload(e, session_id)
     finally:
-        if final_messages:
-            session_store[session_id] = final_messages
+        if completed:
+            await session_store.aappend(session_id, new_messages)
+
+
+# token 级流式响应：合并相邻 token 后按 SSE 格式输出
+async def stream_agent_tokens(session_id: str, query: str, coalesce_ms: float = COALESCE_MAX_DELAY_MS,
+                              coalesce_bytes: int = COALESCE_MAX_BYTES) -> AsyncGenerator[str, None]:
+    async for payload in coalesce_tokens(agent_token_events(session_id, query), coalesce_ms, coalesce_bytes):
+        yield format_sse(payload)
+    yield "data: [DONE]\n\n"
+
 
 # Agent 接口
 @app.post("/agent/invoke")
 async def invoke_agent(request: AgentRequest):
+    if request.mode == "token":
+        mode = "token"
+        generator = stream_agent_tokens(request.session_id, request.query,
+                                        request.coalesce_ms, request.coalesce_bytes)
+    else:
+        mode = "node"
+        generator = stream_agent_response(request.session_id, request.query)
     return StreamingResponse(
-        stream_agent_response(request.session_id, request.query),
+        instrument_stream(mode, generator),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -103,10 +260,35 @@ async def invoke_agent(request: AgentRequest):
 async def get_history(session_id: str):
     return {
         "session_id": session_id,
-        "history": [{"role": m.role, "content": m.content}
-                    for m in session_store[session_id]]
+        "history": [{"role": "user" if m.type == "human" else m.type, "content": m.content}
+                    for m in await session_store.aget(session_id)]
     }
 
+# 会话存储统计（会话数、消息数、估算内存、命中与淘汰次数）
+@app.get("/agent/sessions/stats")
+async def get_session_stats():
+    return await session_store.astats()
+
+# Prometheus 指标：节点 / 工具耗时、活跃流、SSE 帧数与字节数，以及会话存储和工具结果缓存的统计
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    stats = {f"agent_session_store_{k}": v for k, v in (await session_store.astats()).items()
+             if isinstance(v, (int, float))}
+    # 命中 / 未命中按工具统计在 agent_tool_cache_requests_total 中，这里只补充容量相关的值
+    stats.update({f"agent_tool_cache_{k}": v for k, v in tool_result_cache.stats().items()
+                  if k in ("entries", "inflight", "evictions", "expirations")})
+    stats.update({f"agent_context_summary_{k}": v for k, v in context_window.stats().items()})
+    # 按工具子集缓存的已绑定模型
+    stats["agent_bound_model_cache_entries"] = len(bound_models)
+    stats.update({f"agent_bound_model_cache_{k}": v for k, v in bound_model_stats.items()})
+    for server, pool in tool_registry.pools.items():
+        stats.update({f'agent_mcp_pool_{k}{{server="{server}"}}': v for k, v in pool.stats().items()})
+    return PlainTextResponse(render_metrics(stats), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("agent_server:app", host="0.0.0.0", port=8001, reload=True, workers=1)
\ No newline at end of file
+    # 共享会话后端（sqlite/redis）下可以启动多个 worker；内存后端只能单 worker（且开启 reload）
+    workers = int(os.environ.get("AGENT_WORKERS", "1"))
+    if SESSION_BACKEND == "memory" and workers > 1:
+        raise SystemExit("内存会话存储不支持多 worker，请设置 AGENT_SESSION_BACKEND=sqlite 或 redis")
+    uvicorn.run("agent_server:app", host="0.0.0.0", port=8001, reload=workers == 1, workers=workers)
\ No newline at end of file
@@ -151,6 +151,7 @@ function createTypingContainer(type, content) {
         const prefixMap = {
             model: '<span class="font-semibold text-blue-600">🤖 模型：</span>',
             tool: '<span class="font-semibold text-orange-600">🔧 工具：</span>',
+            tool_progress: '<span class="font-semibold text-orange-400">⏳ 工具进度：</span>',
             result: '<span class="font-semibold text-green-600">✅ 最终结果：</span>',
             error: '<span class="font-semibold text-red-600">❌ 错误：</span>',
             unknown: '<span class="font-semibold text-gray-600">ℹ️ 信息：</span>'
@@ -0,0 +1,100 @@
+"""
+批量工具基准：N 个城市的 get_weather 并发调用，对比逐个调用与合并成 get_weather_batch 的 MCP 往返次数和耗时。
+  single:  每个城市一次 get_weather（N 次往返）
+  batched: ToolBatcher 合并为一次 get_weather_batch（1 次往返）
+开始前先用本地的慢批量工具检查 agent_core.wrap_tools：合并后 get_weather 自己的超时和并发上限仍然生效，
+不满足时报错退出（这一项不依赖 MCP 服务器）。
+需要先启动 src/mcp/mcp_server.py。用法: python bench_batch.py [城市数] [轮数]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from langchain_core.tools import ToolException, tool
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+import agent_core
+from agent_core import MCP_CONNECTIONS, wrap_tools
+from mcp_pool import MCPSessionPool
+from tool_batching import batch_tools, batchers
+from tool_limits import ToolLimit
+
+CITIES = ["上海", "北京", "广州", "深圳", "杭州", "成都", "南京", "武汉", "西安", "重庆", "天津", "苏州"]
+
+
+# 本地批量工具每次调用的耗时（秒）和每批的参数个数
+LOCAL_BATCH_DELAY = 0.5
+local_batch_sizes: list = []
+
+
+@tool
+async def get_weather(location: str) -> str:
+    """获取指定城市的天气信息"""
+    return f"Mock天气: {location} 晴朗，25°C"
+
+
+@tool
+async def get_weather_batch(locations: list[str]) -> str:
+    """批量获取多个城市的天气信息"""
+    local_batch_sizes.append(len(locations))
+    await asyncio.sleep(LOCAL_BATCH_DELAY)
+    return json.dumps({loc: f"Mock天气: {loc} 晴朗，25°C" for loc in locations}, ensure_ascii=False)
+
+
+async def check_limits():
+    """get_weather 的 ToolLimit 必须作用在合并后的调用上，而不只是 get_weather_batch 的限制"""
+    agent_core.tool_result_cache.ttls = {}
+    agent_core.default_tool_limit = ToolLimit(max_concurrency=8, timeout=10)
+
+    # 超时：批量调用要 0.5s，get_weather 限 0.1s，调用必须在 0.1s 左右以超时失败
+    agent_core.tool_limit_overrides = {"get_weather": ToolLimit(max_concurrency=8, timeout=0.1)}
+    weather = next(t for t in wrap_tools([get_weather, get_weather_batch]) if t.name == "get_weather")
+    assert "get_weather" in batchers, "get_weather 没有启用批量合并"
+    start = time.perf_counter()
+    try:
+        await weather.ainvoke({"location": "上海"})
+    except ToolException as e:
+        elapsed = time.perf_counter() - start
+        assert elapsed < LOCAL_BATCH_DELAY, f"get_weather 超时在 {elapsed:.2f}s 后才生效"
+        print(f"   limit: 超时生效 {elapsed:.2f}s  {e}")
+    else:
+        raise AssertionError("合并后的 get_weather 没有按自己的超时（0.1s）失败")
+
+    # 并发上限：get_weather 最多 2 个并发，6 个调用每批最多合并 2 个
+    agent_core.tool_limit_overrides = {"get_weather": ToolLimit(max_concurrency=2, timeout=None)}
+    weather = next(t for t in wrap_tools([get_weather, get_weather_batch]) if t.name == "get_weather")
+    local_batch_sizes.clear()
+    await asyncio.gather(*(weather.ainvoke({"location": c}) for c in CITIES[:6]))
+    assert max(local_batch_sizes) <= 2, f"get_weather 并发上限 2 未生效，批大小={local_batch_sizes}"
+    print(f"   limit: 并发上限生效，批大小={local_batch_sizes}")
+
+
+async def run(name: str, tool, pool: MCPSessionPool, cities: list, rounds: int):
+    calls_before = pool.stats()["calls"]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*(tool.ainvoke({"location": c}) for c in cities))
+    elapsed = time.perf_counter() - start
+    round_trips = pool.stats()["calls"] - calls_before
+    print(f"{name:>8}: 工具调用={len(cities) * rounds}  MCP往返={round_trips}  "
+          f"每轮耗时={elapsed / rounds * 1000:.1f}ms  示例={results[-1][0]['text']}")
+
+
+async def main(n: int, rounds: int):
+    await check_limits()
+    cities = (CITIES * (n // len(CITIES) + 1))[:n]
+    pool = MCPSessionPool(MCP_CONNECTIONS["weather"], size=2)
+    tools = await load_mcp_tools(pool, server_name="weather")
+    single = next(t for t in tools if t.name == "get_weather")
+    batched = next(t for t in batch_tools(tools) if t.name == "get_weather")
+    await single.ainvoke({"location": "上海"})  # 预热连接
+
+    await run("single", single, pool, cities, rounds)
+    await run("batched", batched, pool, cities, rounds)
+    await pool.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else 10, args[1] if len(args) > 1 else 20))
@@ -0,0 +1,54 @@
+"""
+token 合并基准：模拟逐字符输出的模型流（与 MockLLM 一样一个字符一个 chunk），
+对比不同合并参数下的 SSE 帧数、字节数、格式化 CPU 时间，以及每个字符从产生到发出的额外延迟。
+用法: python bench_coalesce.py [字符数] [每字符间隔ms]
+"""
+import asyncio
+import sys
+import time
+
+from agent_server import format_sse
+from coalesce import coalesce_tokens
+
+TEXT = "查询结果：Mock天气: 上海 晴朗，25°C。Thinking about the weather forecast ... "
+
+
+async def char_stream(chars: int, interval_ms: float, produced: list):
+    for i in range(chars):
+        await asyncio.sleep(interval_ms / 1000)
+        produced.append(time.perf_counter())
+        yield {"type": "token", "content": TEXT[i % len(TEXT)], "session_id": "bench"}
+    yield {"type": "result", "content": "", "session_id": "bench"}
+
+
+async def run(chars: int, interval_ms: float, max_delay_ms: float, max_bytes: int):
+    produced, delays = [], []
+    frames = nbytes = 0
+    cpu = 0.0
+    start = time.perf_counter()
+    async for payload in coalesce_tokens(char_stream(chars, interval_ms, produced), max_delay_ms, max_bytes):
+        now = time.perf_counter()
+        c0 = time.process_time()
+        frame = format_sse(payload)
+        cpu += time.process_time() - c0
+        frames += 1
+        nbytes += len(frame.encode("utf-8"))
+        if payload["type"] == "token":
+            sent = len(delays)
+            delays.extend((now - t) * 1000 for t in produced[sent:sent + len(payload["content"])])
+    elapsed = time.perf_counter() - start
+    delays.sort()
+    label = "不合并" if max_delay_ms <= 0 else f"{max_delay_ms:g}ms/{max_bytes}B"
+    print(f"{label:>12}: 帧数={frames:5d}  帧/秒={frames / elapsed:8.1f}  字节={nbytes:7d}  "
+          f"格式化CPU={cpu * 1000:6.1f}ms  额外延迟 mean={sum(delays) / len(delays):5.1f}ms "
+          f"p95={delays[int(len(delays) * 0.95)]:5.1f}ms")
+
+
+async def main(chars: int, interval_ms: float):
+    for max_delay_ms, max_bytes in [(0, 0), (10, 512), (20, 512), (50, 512), (50, 64)]:
+        await run(chars, interval_ms, max_delay_ms, max_bytes)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(main(int(args[0]) if args else 2000, float(args[1]) if len(args) > 1 else 1))
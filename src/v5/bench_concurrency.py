@@ -0,0 +1,71 @@
+"""
+并发基准：N 个会话同时请求 stream_agent_response，比较总耗时与单请求耗时的倍数。
+  blocking: 在事件循环里直接调用阻塞的 _generate（time.sleep），N 个请求串行，约 Nx
+  async:    MockLLM._agenerate 用 asyncio.sleep，约 1x
+  offload:  offload_blocking=True，阻塞的 _generate 放到线程池，约 1x（受线程池大小限制）
+结果作为回归检查：async 必须低于 1.5x，offload 不超过线程池分批数 + 0.5x；blocking 作为对照必须明显串行
+（证明这个检查能发现阻塞），任何一项不满足时报错退出。
+不依赖 MCP 服务器。用法: python bench_concurrency.py [并发数]
+"""
+import asyncio
+import math
+import os
+import sys
+import time
+
+import agent_core
+import agent_server
+from agent_core import load_tools
+from bench_stream import get_weather
+from mock_llm import MockLLM
+
+
+class BlockingLLM(MockLLM):
+    """模拟旧问题：异步路径里直接执行阻塞的 _generate"""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop=stop)
+
+    def bind_tools(self, tools):
+        new_instance = BlockingLLM()
+        new_instance.tools = tools
+        return new_instance
+
+
+async def one(i: int):
+    async for _ in agent_server.stream_agent_response(f"bench_{i}", "上海天气怎么样?"):
+        pass
+
+
+async def run(name: str, llm: MockLLM, concurrency: int) -> float:
+    """返回 N 并发总耗时 / 单请求耗时"""
+    agent_core.mock_llm = llm.bind_tools(agent_core.loaded_tools)
+    agent_server.session_store.clear()
+
+    start = time.perf_counter()
+    await one(-1)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(concurrency)))
+    total = time.perf_counter() - start
+    print(f"{name:>8}: 单请求={single:.2f}s  {concurrency}并发总耗时={total:.2f}s  倍数={total / single:.2f}x")
+    return total / single
+
+
+async def main(concurrency: int):
+    load_tools([get_weather])
+    blocking = await run("blocking", BlockingLLM(), concurrency)
+    concurrent = await run("async", MockLLM(), concurrency)
+    offload = await run("offload", MockLLM(offload_blocking=True), concurrency)
+
+    # 默认线程池的大小（ThreadPoolExecutor 的默认值），offload 最多同时执行这么多个阻塞调用
+    pool_batches = math.ceil(concurrency / min(32, (os.cpu_count() or 1) + 4))
+    assert concurrency < 2 or blocking > concurrency / 2, f"blocking 对照没有串行（{blocking:.2f}x），检查失效"
+    assert concurrent < 1.5, f"async 路径的 {concurrency} 个并发请求被串行了（{concurrent:.2f}x，应 < 1.5x）"
+    assert offload < pool_batches + 0.5, f"offload 超出线程池限制（{offload:.2f}x，应 < {pool_batches + 0.5}x）"
+    print("检查通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8))
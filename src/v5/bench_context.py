@@ -0,0 +1,114 @@
+"""
+长会话基准：一个会话连续对话 1000 轮（天气查询和闲聊交替），每轮像 agent_server 一样把全部历史 + 新问题交给图。
+模型按输入长度计算首 token 延迟（prefill_tokens_per_sec），模拟真实模型的输入处理耗时。
+  full:     不裁剪上下文（AGENT_CONTEXT_MAX_TOKENS=0），只在若干轮次上采样（先用合成历史补齐到该轮次）
+  windowed: 上下文窗口 + 增量摘要，完整跑完全部轮次，按每 100 轮统计平均单轮耗时和模型输入 token 数
+不依赖 MCP 服务器。用法: python bench_context.py [--turns 1000] [--window 2000] [--prefill 100000]
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+import agent_core
+from agent_core import context_window, get_graph, load_tools
+from context_window import estimate_tokens
+from latency_model import LatencyModel
+from mock_llm import MockLLM
+
+QUERIES = ["上海的天气怎么样?", "你好，今天过得怎么样", "北京和广州的天气", "给我讲个笑话吧"]
+
+
+@tool
+async def get_weather(location: str) -> str:
+    """获取指定城市的天气信息"""
+    return f"Mock天气: {location} 晴朗，25°C"
+
+
+# 每次模型调用的输入 token 数
+prompt_tokens: list = []
+
+
+class RecordingLLM(MockLLM):
+    def _plan(self, messages):
+        prompt_tokens.append(sum(estimate_tokens(m) for m in messages))
+        return super()._plan(messages)
+
+    def bind_tools(self, tools):
+        new_instance = RecordingLLM(latency_model=self.latency_model)
+        new_instance.tools = tools
+        return new_instance
+
+
+async def run_turn(graph, history: list, query: str, session_id: str) -> tuple[float, list]:
+    """执行一轮对话，返回 (耗时, 本轮新增消息)；与 agent_server 一样从 updates 中收集新增消息"""
+    user_message = HumanMessage(content=query)
+    new_messages = [user_message]
+    start = time.perf_counter()
+    async for step in graph.astream({"messages": [*history, user_message], "session_id": session_id},
+                                    stream_mode="updates"):
+        for node, update in step.items():
+            if node != "manage_context" and update and "messages" in update:
+                new_messages.extend(update["messages"])
+    return time.perf_counter() - start, new_messages
+
+
+def synthetic_history(turns: int) -> list:
+    """预先生成的历史（与 run_turn 产生的消息形状相同），用于直接测量第 N 轮的耗时"""
+    history = []
+    for i in range(turns):
+        query = QUERIES[i % len(QUERIES)]
+        history.append(HumanMessage(content=query, id=f"h{i}"))
+        if "天气" in query:
+            history.append(AIMessage(content="正在调用get_weather工具查询信息...", id=f"c{i}",
+                                     tool_calls=[{"name": "get_weather", "args": {"location": "上海"}, "id": f"t{i}"}]))
+            history.append(ToolMessage(content="Mock天气: 上海 晴朗，25°C", tool_call_id=f"t{i}", id=f"r{i}"))
+            history.append(AIMessage(content="查询结果：Mock天气: 上海 晴朗，25°C", id=f"a{i}"))
+        else:
+            history.append(AIMessage(content="你的问题我无法回答...", id=f"a{i}"))
+    return history
+
+
+async def main(turns: int, window: int, prefill: float):
+    load_tools([get_weather])
+    llm = RecordingLLM(latency_model=LatencyModel(ttft_ms=(0, 0), tokens_per_sec=0, prefill_tokens_per_sec=prefill))
+    agent_core.mock_llm = llm.bind_tools(agent_core.loaded_tools)
+    graph = get_graph()
+    print(f"prefill={prefill:g} tokens/s  window={window} tokens")
+
+    # full：不裁剪，单轮耗时随历史长度线性增长
+    context_window.max_tokens = 0
+    print("full (不裁剪):")
+    for n in sorted({1, 10, 100, turns // 4, turns // 2, turns}):
+        prompt_tokens.clear()
+        elapsed, _ = await run_turn(graph, synthetic_history(n - 1), QUERIES[(n - 1) % len(QUERIES)], f"full-{n}")
+        print(f"  第 {n:>4} 轮: 耗时={elapsed * 1000:7.1f}ms  模型输入={max(prompt_tokens):>6} tokens")
+
+    # windowed：连续跑完所有轮次，历史按 agent_server 的方式逐轮追加
+    context_window.max_tokens = window
+    context_window.clear()
+    print("windowed (窗口 + 增量摘要):")
+    history, bucket, tokens = [], [], []
+    bucket_size = max(turns // 10, 1)
+    for i in range(turns):
+        prompt_tokens.clear()
+        elapsed, new_messages = await run_turn(graph, history, QUERIES[i % len(QUERIES)], "windowed")
+        history.extend(new_messages)
+        bucket.append(elapsed)
+        tokens.append(max(prompt_tokens))
+        if (i + 1) % bucket_size == 0:
+            print(f"  第 {i + 2 - bucket_size:>4}-{i + 1:>4} 轮: 平均耗时={sum(bucket) / len(bucket) * 1000:6.1f}ms  "
+                  f"最大耗时={max(bucket) * 1000:6.1f}ms  模型输入≤{max(tokens):>5} tokens  历史消息={len(history)}")
+            bucket, tokens = [], []
+    print(f"  摘要: {context_window.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=2000)
+    parser.add_argument("--prefill", type=float, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.window, args.prefill))
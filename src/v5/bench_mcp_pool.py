@@ -0,0 +1,57 @@
+"""
+MCP 工具调用基准：对比每次调用新建会话（MultiServerMCPClient.get_tools 的工具）与会话池复用长连接的单次调用耗时。
+需要先启动 src/mcp/mcp_server.py。用法: python bench_mcp_pool.py [调用次数] [并发数]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+from agent_core import MCP_CONNECTIONS
+from mcp_pool import MCPSessionPool
+
+
+async def timed_call(tool, latencies: list):
+    start = time.perf_counter()
+    await tool.ainvoke({"location": "上海"})
+    latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run(name: str, tool, calls: int, concurrency: int):
+    await timed_call(tool, [])  # 预热（池模式下建立连接）
+    latencies: list = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await timed_call(tool, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    total = time.perf_counter() - start
+    latencies.sort()
+    print(f"{name:>9}: 平均={statistics.mean(latencies):6.1f}ms  p50={latencies[len(latencies) // 2]:6.1f}ms  "
+          f"p95={latencies[int(len(latencies) * 0.95)]:6.1f}ms  总耗时={total:.2f}s")
+    return statistics.mean(latencies)
+
+
+async def main(calls: int, concurrency: int):
+    client = MultiServerMCPClient(MCP_CONNECTIONS)
+    per_call_tool = next(t for t in await client.get_tools() if t.name == "get_weather")
+
+    pool = MCPSessionPool(MCP_CONNECTIONS["weather"], size=2)
+    pooled_tool = next(t for t in await load_mcp_tools(pool, server_name="weather") if t.name == "get_weather")
+
+    print(f"{calls} 次调用，并发 {concurrency}")
+    per_call = await run("per-call", per_call_tool, calls, concurrency)
+    pooled = await run("pooled", pooled_tool, calls, concurrency)
+    print(f"每次调用节省 {per_call - pooled:.1f}ms（{per_call / pooled:.1f}x），池统计: {pool.stats()}")
+    await pool.close()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(args[0] if args else 100, args[1] if len(args) > 1 else 1))
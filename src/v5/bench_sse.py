@@ -0,0 +1,115 @@
+"""
+SSE 解析微基准：对比旧的逐行解析（async for line + strip + decode + startswith + json.loads）
+与 sse.SSEDecoder（iter_any 原始字节块 + 增量解码）的事件吞吐量。
+两者都读取同一个 aiohttp.StreamReader，输入按随机大小切块，模拟网络 chunk 边界。
+计时前先检查 SSEDecoder 在 \n / \r\n / \r 三种换行下、任意 chunk 切分位置（包括切在 \r 与 \n 之间、
+\r 单独落在一块末尾）都解析出相同的事件，不一致时直接报错。
+用法: python bench_sse.py [事件数]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+import aiohttp
+from aiohttp.base_protocol import BaseProtocol
+
+from sse import SSEDecoder
+
+
+def make_stream(events: int) -> bytes:
+    parts = []
+    for i in range(events):
+        payload = json.dumps({"type": "token", "content": "上海天气晴朗" * (i % 5 + 1), "session_id": "bench"})
+        parts.append(f"id: {i}\ndata: {payload}\n\n")
+    parts.append("data: [DONE]\n\n")
+    return "".join(parts).encode("utf-8")
+
+
+def split_chunks(data: bytes, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = rng.randint(64, 4096)
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def make_reader(chunks: list) -> aiohttp.StreamReader:
+    loop = asyncio.get_running_loop()
+    reader = aiohttp.StreamReader(BaseProtocol(loop), 2 ** 16, loop=loop)
+    for chunk in chunks:
+        reader.feed_data(chunk)
+    reader.feed_eof()
+    return reader
+
+
+async def legacy_parse(reader: aiohttp.StreamReader) -> int:
+    """旧实现（agent_client.invoke_stream 原逻辑）"""
+    count = 0
+    async for line in reader:
+        line_str = line.strip().decode("utf-8")
+        if not line_str or not line_str.startswith("data:"):
+            continue
+        data = line_str[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        json.loads(data)
+        count += 1
+    return count
+
+
+async def decoder_parse(reader: aiohttp.StreamReader) -> int:
+    count, decoder = 0, SSEDecoder()
+    async for chunk in reader.iter_any():
+        for event in decoder.feed(chunk):
+            if event.data == "[DONE]":
+                return count
+            event.json()
+            count += 1
+    return count
+
+
+def decode_all(chunks: list) -> list:
+    decoder = SSEDecoder()
+    return [(e.event, e.id, e.data) for chunk in chunks for e in decoder.feed(chunk)]
+
+
+def check_line_endings():
+    """同一段事件流换成不同换行符、按不同位置切块，解析结果必须一致"""
+    text = "event: tool\nid: 1\ndata: a\ndata: b\n\n: ping\n\ndata: 上海\n\ndata: [DONE]\n\n"
+    expected = decode_all([text.encode("utf-8")])
+    assert [data for _, _, data in expected] == ["a\nb", "上海", "[DONE]"], expected
+    for newline in ("\n", "\r\n", "\r"):
+        data = text.replace("\n", newline).encode("utf-8")
+        # 两块的所有切分位置
+        for i in range(len(data) + 1):
+            assert decode_all([data[:i], data[i:]]) == expected, (newline, i)
+        # 逐字节
+        assert decode_all([data[i:i + 1] for i in range(len(data))]) == expected, newline
+    # \r 单独落在一块末尾、下一块只有 \n
+    chunks = [b"data: a\r\n\r", b"\n", b"data: b\n\n"]
+    assert [data for _, _, data in decode_all(chunks)] == ["a", "b"], decode_all(chunks)
+
+
+async def run(name, fn, chunks, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        reader = make_reader(chunks)
+        start = time.perf_counter()
+        count = await fn(reader)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>8}: {count} 事件, {count / best:,.0f} 事件/秒")
+
+
+async def main(events: int):
+    check_line_endings()
+    chunks = split_chunks(make_stream(events))
+    await run("legacy", legacy_parse, chunks)
+    await run("decoder", decoder_parse, chunks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
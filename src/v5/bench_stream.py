@@ -0,0 +1,80 @@
+"""
+对比 stream_agent_response 的两种执行方式：
+  legacy: 先 astream 推送事件，再 ainvoke 拿最终状态（整张图执行两次）
+  single: astream(stream_mode="updates") 一次执行，从增量更新中得到事件和最终结果
+
+不依赖 MCP 服务器：用本地 get_weather 工具替代，统计每个请求的模型调用 / 工具调用次数与耗时。
+用法: python bench_stream.py [请求数]
+"""
+import asyncio
+import sys
+import time
+
+from langchain_core.tools import tool
+
+import agent_core
+import agent_server
+from agent_core import build_graph, load_tools
+from mock_llm import MockLLM
+
+counters = {"llm": 0, "tool": 0}
+
+
+class CountingLLM(MockLLM):
+    def _respond(self, messages):
+        # 同步 / 异步 / 流式路径都经过 _respond，每次模型调用计数一次
+        counters["llm"] += 1
+        return super()._respond(messages)
+
+    def bind_tools(self, tools):
+        new_instance = CountingLLM()
+        new_instance.tools = tools
+        return new_instance
+
+
+@tool
+async def get_weather(location: str) -> str:
+    """获取指定城市的天气信息"""
+    counters["tool"] += 1
+    return f"Mock天气: {location} 晴朗，25°C"
+
+
+async def legacy_stream(session_id: str, query: str):
+    """旧实现：astream + ainvoke"""
+    graph = build_graph()
+    inputs = {"messages": [{"role": "user", "content": query}], "session_id": session_id}
+    async for _ in graph.astream(inputs):
+        pass
+    await graph.ainvoke(inputs)
+
+
+async def single_stream(session_id: str, query: str):
+    """新实现：直接消费 agent_server.stream_agent_response"""
+    async for _ in agent_server.stream_agent_response(session_id, query):
+        pass
+
+
+async def run(name, fn, requests: int):
+    counters["llm"] = counters["tool"] = 0
+    agent_server.session_store.clear()
+    start = time.perf_counter()
+    for i in range(requests):
+        await fn(f"bench_{name}_{i}", "上海天气怎么样?")
+    elapsed = time.perf_counter() - start
+    print(f"{name:>7}: 模型调用/请求={counters['llm'] / requests:.1f}  "
+          f"工具调用/请求={counters['tool'] / requests:.1f}  "
+          f"平均耗时={elapsed / requests:.2f}s")
+
+
+async def main(requests: int):
+    load_tools([get_weather])
+    # 关闭工具结果缓存，统计的是图实际执行的工具调用次数
+    agent_core.tool_result_cache.ttls = {}
+    agent_core.mock_llm = CountingLLM().bind_tools(agent_core.loaded_tools)
+
+    await run("legacy", legacy_stream, requests)
+    await run("single", single_stream, requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
@@ -0,0 +1,144 @@
+"""
+工具选择基准：500 个工具的目录（3 个天气工具 + 497 个合成工具），每个请求按问题用 BM25 选出 top-k 个工具绑定给模型。
+  index:  对全部工具名称和描述建索引的耗时（随工具清单构建一次）
+  recall: 标注了期望工具的问题，期望工具是否出现在 top-k 中，以及每次检索的耗时
+  prompt: 绑定全部工具 vs 只绑定 top-k 时，每个请求携带的工具 schema 大小（JSON 字节数，约 4 字节 / token 估算）
+  bind:   每个请求的选择开销（检索 + 绑定）：每次重新绑定 vs 按工具子集缓存绑定好的模型；
+          SchemaLLM 绑定时和真实模型一样把每个工具转换成 function schema，绑定耗时与工具数成正比
+不依赖 MCP 服务器。用法: python bench_tool_select.py [--k 8] [--requests 2000]
+"""
+import argparse
+import json
+import time
+
+from langchain_core.messages import HumanMessage
+from langchain_core.tools import StructuredTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import agent_core
+from agent_core import bound_model_stats, load_tools, select_tools
+from mock_llm import MockLLM
+
+DOMAINS = [
+    ("stock", "股票", "按股票代码处理行情、市值与涨跌幅"), ("fund", "基金", "基金净值、持仓与收益率"),
+    ("flight", "航班", "机票预订、航班动态与值机"), ("train", "火车票", "车次、余票与改签"),
+    ("hotel", "酒店", "酒店房型、入住日期与价格"), ("order", "订单", "电商订单、物流状态与退款"),
+    ("invoice", "发票", "增值税发票的开具与报销"), ("express", "快递", "快递单号、派送进度与寄件"),
+    ("calendar", "日程", "会议日程、提醒与空闲时间"), ("email", "邮件", "收件箱、草稿与附件"),
+    ("contact", "联系人", "通讯录中的姓名、电话与分组"), ("music", "音乐", "歌曲、歌单与歌手"),
+    ("movie", "电影", "影片、场次与影院"), ("news", "新闻", "新闻头条、资讯与热点"),
+    ("map", "地图", "地点、路线规划与导航"), ("taxi", "打车", "网约车行程、司机与车费"),
+    ("restaurant", "餐厅", "附近餐厅、菜系与订座"), ("recipe", "菜谱", "菜谱食材与烹饪步骤"),
+    ("translation", "翻译", "把文本翻译成其他语言"), ("exchange", "汇率", "货币汇率与换算"),
+    ("repo", "代码仓库", "代码仓库的分支、提交与合并请求"), ("database", "数据库", "数据库表、SQL 查询与备份"),
+    ("server", "服务器", "服务器负载、进程与日志"), ("ticket", "工单", "客服工单、优先级与处理人"),
+    ("document", "文档", "在线文档、表格与权限"),
+]
+ACTIONS = [
+    ("get", "查询"), ("list", "列出"), ("search", "搜索"), ("create", "创建"), ("update", "更新"),
+    ("delete", "删除"), ("cancel", "取消"), ("export", "导出"), ("import", "导入"), ("share", "分享"),
+    ("subscribe", "订阅"), ("summarize", "汇总"), ("compare", "比较"), ("monitor", "监控"), ("remind", "提醒"),
+    ("archive", "归档"), ("restore", "恢复"), ("analyze", "分析"), ("recommend", "推荐"), ("sync", "同步"),
+]
+WEATHER_TOOLS = [
+    ("get_weather", "获取指定城市的天气信息"),
+    ("get_weather_batch", "批量获取多个城市的天气信息，返回 城市 -> 天气"),
+    ("get_weather_forecast", "获取指定城市未来几天的天气预报（耗时较长，每算完一天通过进度通知推送当天结果）"),
+]
+# (问题, 期望被选中的工具)
+QUERIES = [
+    ("上海今天天气怎么样?", "get_weather"),
+    ("北京未来三天的天气预报", "get_weather_forecast"),
+    ("帮我查询一下贵州茅台的股票行情", "get_stock"),
+    ("取消我明天去广州的航班", "cancel_flight"),
+    ("比较一下这几只基金的收益率", "compare_fund"),
+    ("导出上个月的发票用于报销", "export_invoice"),
+    ("推荐几家附近的川菜餐厅", "recommend_restaurant"),
+    ("把这段话翻译成英文", "get_translation"),
+    ("我的快递到哪了，单号 SF123", "get_express"),
+    ("给我创建一个明天下午三点的会议日程", "create_calendar"),
+    ("搜索一下最近的科技新闻", "search_news"),
+    ("监控一下服务器负载", "monitor_server"),
+]
+
+
+def make_tool(name: str, description: str) -> StructuredTool:
+    async def run(**kwargs):
+        return f"{name}: {kwargs}"
+
+    schema = {"type": "object", "properties": {
+        "query": {"type": "string", "description": "查询条件"},
+        "limit": {"type": "integer", "description": "最多返回条数", "default": 10},
+    }, "required": ["query"]}
+    return StructuredTool(name=name, description=description, args_schema=schema, coroutine=run)
+
+
+def build_catalog(size: int = 500) -> list:
+    tools = [make_tool(name, description) for name, description in WEATHER_TOOLS]
+    for slug, noun, detail in DOMAINS:
+        for verb, action in ACTIONS:
+            tools.append(make_tool(f"{verb}_{slug}", f"{action}{noun}：{detail}"))
+    return tools[:size]
+
+
+class SchemaLLM(MockLLM):
+    """绑定工具时像真实模型一样生成 function schema（随请求发送给模型服务）"""
+    schemas: list = []
+
+    def bind_tools(self, tools):
+        new_instance = SchemaLLM(latency_model=self.latency_model)
+        new_instance.tools = tools
+        new_instance.schemas = [convert_to_openai_tool(t) for t in tools]
+        return new_instance
+
+
+def schema_bytes(model: SchemaLLM) -> int:
+    return len(json.dumps(model.schemas, ensure_ascii=False).encode("utf-8"))
+
+
+def main(k: int, requests: int):
+    catalog = build_catalog()
+    agent_core.TOOL_TOP_K = k
+
+    start = time.perf_counter()
+    load_tools(catalog)
+    print(f"index:  {len(catalog)} 个工具，load_tools（含建索引）{(time.perf_counter() - start) * 1000:.1f}ms")
+    all_tools = agent_core.mock_llm = SchemaLLM().bind_tools(catalog)
+
+    hits, elapsed = 0, 0.0
+    for query, expected in QUERIES:
+        start = time.perf_counter()
+        names = agent_core.tool_index.lookup(query, k)
+        elapsed += time.perf_counter() - start
+        hits += expected in names
+        print(f"  {'✓' if expected in names else '✗'} {query} -> {names}")
+    print(f"recall: {hits}/{len(QUERIES)} 个问题选中了期望工具，平均检索 {elapsed / len(QUERIES) * 1e6:.0f}µs")
+
+    full = schema_bytes(all_tools)
+    selected = [schema_bytes(select_tools([HumanMessage(q)])) for q, _ in QUERIES]
+    avg = sum(selected) / len(selected)
+    print(f"prompt: 全部工具 {full} 字节 (~{full // 4} tokens)  top-{k} 平均 {avg:.0f} 字节 (~{avg / 4:.0f} tokens)"
+          f"  减少 {1 - avg / full:.1%}")
+
+    messages = [[HumanMessage(q)] for q, _ in QUERIES]
+    for name, cache_size in (("uncached", 0), ("cached", agent_core.BOUND_MODEL_CACHE_SIZE)):
+        agent_core.BOUND_MODEL_CACHE_SIZE = cache_size
+        agent_core.bound_models.clear()
+        bound_model_stats.update(hits=0, misses=0, evictions=0)
+        start = time.perf_counter()
+        for i in range(requests):
+            select_tools(messages[i % len(messages)])
+        elapsed = time.perf_counter() - start
+        print(f"bind:   {name:>8} 每个请求 {elapsed / requests * 1e6:.0f}µs  "
+              f"命中={bound_model_stats['hits']} 未命中={bound_model_stats['misses']}")
+    start = time.perf_counter()
+    SchemaLLM().bind_tools(catalog)
+    print(f"        (对比：绑定全部 {len(catalog)} 个工具一次 {(time.perf_counter() - start) * 1000:.1f}ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.k, args.requests)
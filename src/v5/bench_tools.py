@@ -0,0 +1,81 @@
+"""
+多工具调用基准：问题中包含多个城市时，MockLLM 在同一轮里发起多个 get_weather 调用，由 ToolNode 并发执行。
+  concurrent: 每个工具并发上限 8，总耗时约为 max(单个调用耗时)
+  serial:     并发上限 1，总耗时约为 sum(单个调用耗时)
+  partial:    一个调用报错、一个调用超时，其余调用正常返回，模型仍给出回答
+结果作为回归检查：concurrent 不超过 max + 0.3s（且明显小于 sum），serial 作为对照必须接近 sum；
+partial 这一轮必须正常结束，3 个调用各有结果（1 成功 2 失败），总耗时不超过超时时间 + 0.3s，任何一项不满足时报错退出。
+不依赖 MCP 服务器：用本地的慢工具模拟不同城市的响应时间。用法: python bench_tools.py
+"""
+import asyncio
+import time
+
+from langchain_core.messages import HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+import agent_core
+from agent_core import get_graph, load_tools
+from latency_model import PROFILES, LatencyModel
+from mock_llm import MockLLM
+from tool_limits import ToolLimit
+
+# 各城市的模拟耗时（秒）；深圳抛异常，杭州超过超时时间
+CITY_DELAYS = {"上海": 0.3, "北京": 0.5, "广州": 0.4, "杭州": 5.0}
+
+
+@tool
+async def get_weather(location: str) -> str:
+    """获取指定城市的天气信息"""
+    if location == "深圳":
+        raise ConnectionError("upstream unavailable")
+    await asyncio.sleep(CITY_DELAYS.get(location, 0.1))
+    return f"Mock天气: {location} 晴朗，25°C"
+
+
+async def run(name: str, query: str, limit: ToolLimit) -> tuple[float, dict]:
+    agent_core.default_tool_limit = limit
+    agent_core.graph_cache.clear()
+    graph = get_graph()
+
+    start = time.perf_counter()
+    state = await graph.ainvoke({"messages": [HumanMessage(content=query)], "session_id": name})
+    elapsed = time.perf_counter() - start
+
+    results = [m for m in state["messages"] if isinstance(m, ToolMessage)]
+    failed = [m for m in results if m.status == "error"]
+    print(f"{name:>10}: 耗时={elapsed:.2f}s  工具调用={len(results)}  失败={len(failed)}")
+    for m in failed:
+        print(f"{'':>12}{m.content}")
+    print(f"{'':>12}{state['messages'][-1].content}")
+    return elapsed, state
+
+
+async def main():
+    load_tools([get_weather])
+    # 各场景查询相同的城市，关闭结果缓存，避免后面的场景直接命中前面的结果
+    agent_core.tool_result_cache.ttls = {}
+    # 模型调用不加延迟，耗时只反映工具执行
+    agent_core.mock_llm = MockLLM(latency_model=LatencyModel(**PROFILES["instant"])).bind_tools(agent_core.loaded_tools)
+
+    query = "上海、北京和广州的天气怎么样?"
+    delays = [CITY_DELAYS[c] for c in ("上海", "北京", "广州")]
+    print(f"单个调用耗时: {delays}  max={max(delays)}s  sum={sum(delays):.1f}s")
+    concurrent, _ = await run("concurrent", query, ToolLimit(max_concurrency=8, timeout=2))
+    serial, _ = await run("serial", query, ToolLimit(max_concurrency=1, timeout=2))
+    try:
+        partial, state = await run("partial", "上海、深圳和杭州的天气怎么样?", ToolLimit(max_concurrency=8, timeout=1))
+    except Exception as e:
+        raise AssertionError(f"单个工具失败中断了整轮对话: {type(e).__name__}: {e}") from e
+
+    assert concurrent < max(delays) + 0.3, f"多工具调用没有并发执行（{concurrent:.2f}s，应 < {max(delays) + 0.3:.1f}s）"
+    assert serial > sum(delays) - 0.1, f"serial 对照没有串行（{serial:.2f}s），检查失效"
+    results = [m for m in state["messages"] if isinstance(m, ToolMessage)]
+    failed = [m for m in results if m.status == "error"]
+    assert len(results) == 3 and len(failed) == 2, f"partial 应有 3 个工具结果、2 个失败，实际 {len(results)} / {len(failed)}"
+    assert state["messages"][-1].content.startswith("查询结果："), "单个工具失败中断了整轮对话"
+    assert partial < 1 + 0.3, f"超时的工具调用拖慢了整轮（{partial:.2f}s，应 < 1.3s）"
+    print("检查通过")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+测量 agent_server 在共享 SQLite 会话存储下，吞吐量随 worker 数的变化。
+
+对每个 worker 数启动一次 uvicorn（AGENT_SESSION_BACKEND=sqlite），并发发送请求统计 req/s，
+并检查同一 session 的多轮对话在不同 worker 之间历史是否一致。
+需要先启动 MCP 服务器：python ../mcp/mcp_server.py
+用法: python bench_workers.py [最大worker数] [请求数] [并发数]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+PORT = 8011
+SERVER_URL = f"http://localhost:{PORT}"
+
+
+async def wait_ready(session: aiohttp.ClientSession, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{SERVER_URL}/agent/history/ping") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("agent_server 启动超时")
+
+
+async def invoke(session: aiohttp.ClientSession, session_id: str, query: str):
+    async with session.post(f"{SERVER_URL}/agent/invoke",
+                            json={"session_id": session_id, "query": query, "stream": True}) as resp:
+        await resp.read()
+        return resp.status
+
+
+async def measure(workers: int, requests: int, concurrency: int) -> float:
+    db_path = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    env = dict(os.environ, AGENT_SESSION_BACKEND="sqlite", AGENT_SESSION_DB=db_path)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "agent_server:app",
+         "--port", str(PORT), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session)
+
+            # 一致性检查：同一 session 连续两轮，无论落到哪个 worker，历史都应累积
+            await invoke(session, "consistency", "上海天气怎么样?")
+            await invoke(session, "consistency", "再说一遍")
+            async with session.get(f"{SERVER_URL}/agent/history/consistency") as resp:
+                history = (await resp.json())["history"]
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one(i: int):
+                async with semaphore:
+                    return await invoke(session, f"bench_{i}", "上海天气怎么样?")
+
+            start = time.perf_counter()
+            statuses = await asyncio.gather(*(one(i) for i in range(requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    errors = sum(1 for s in statuses if s != 200)
+    throughput = requests / elapsed
+    print(f"workers={workers}  吞吐={throughput:.2f} req/s  错误={errors}  跨轮历史消息数={len(history)}")
+    return throughput
+
+
+async def main(max_workers: int, requests: int, concurrency: int):
+    baseline = None
+    for workers in range(1, max_workers + 1):
+        throughput = await measure(workers, requests, concurrency)
+        baseline = baseline or throughput
+        print(f"  相对单 worker 加速比: {throughput / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    max_workers, requests, concurrency = (args + [4, 16, 8][len(args):])[:3]
+    asyncio.run(main(max_workers, requests, concurrency))
@@ -0,0 +1,66 @@
+"""
+SSE 输出的 token 合并：把连续的 token 事件攒成一帧再发送，
+满足任一条件即刷新：距离本批第一个 token 超过 max_delay_ms，或累计内容超过 max_bytes，或遇到非 token 事件。
+"""
+import asyncio
+from typing import AsyncIterator, Dict, Optional
+
+
+async def coalesce_tokens(events: AsyncIterator[Dict], max_delay_ms: float = 20,
+                          max_bytes: int = 512) -> AsyncIterator[Dict]:
+    """events 中 type == "token" 的事件会被合并，其余事件原样透传（透传前先刷新已攒的 token）"""
+    if max_delay_ms <= 0:
+        async for event in events:
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    pending: Optional[asyncio.Task] = None
+    batch: Optional[Dict] = None
+    parts = []
+    size = 0
+    deadline = 0.0
+
+    def flush() -> Dict:
+        nonlocal batch, parts, size
+        merged = dict(batch, content="".join(parts))
+        batch, parts, size = None, [], 0
+        return merged
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if batch is not None:
+                # 已有未发送的 token：最多等到截止时间，不取消上游的 __anext__，下一轮继续等它
+                done, _ = await asyncio.wait({pending}, timeout=max(deadline - loop.time(), 0))
+                if not done:
+                    yield flush()
+                    continue
+            try:
+                event = await pending
+            except StopAsyncIteration:
+                pending = None
+                break
+            pending = None
+
+            if event.get("type") != "token":
+                if batch is not None:
+                    yield flush()
+                yield event
+                continue
+
+            if batch is None:
+                batch = event
+                deadline = loop.time() + max_delay_ms / 1000
+            parts.append(event["content"])
+            size += len(event["content"].encode("utf-8"))
+            if size >= max_bytes:
+                yield flush()
+
+        if batch is not None:
+            yield flush()
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
@@ -0,0 +1,108 @@
+"""
+对话上下文管理：每轮只把 token 预算内的最近几轮对话原样交给模型，更早的对话压缩成摘要。
+
+- 窗口从最新一轮往前按整轮（从 HumanMessage 开始）累加，工具调用和它的结果不会被拆开；当前这一轮总是保留
+- 摘要按会话缓存并增量更新：记住上次摘要到的最后一条消息，下一轮只需要把新滑出窗口的几条消息并入摘要，
+  找不到上次的位置（进程重启、历史被截断）时才对窗口外的全部消息重新生成
+- 默认的摘要方式是抽取式的（保留每轮的问题和回答的开头），总长度有上限，超出时丢弃最早的内容；
+  可以传入 summarizer 换成调用模型生成摘要
+- token 数按字符估算（与 LatencyModel 的输出 token 计数一致），只用于预算，不追求精确
+"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+# (之前的摘要, 新滑出窗口的消息) -> 新摘要
+Summarizer = Callable[[str, List[BaseMessage]], Awaitable[str]]
+
+
+def estimate_tokens(msg: BaseMessage) -> int:
+    tokens = len(str(msg.content))
+    for call in getattr(msg, "tool_calls", None) or []:
+        tokens += len(call.get("name", "")) + len(str(call.get("args", "")))
+    return tokens
+
+
+def extract_turns(messages: List[BaseMessage], max_chars: int = 60) -> List[str]:
+    """每轮对话取用户问题和最终回答（不含工具调用过程）各一行"""
+    lines = []
+    for msg in messages:
+        if isinstance(msg, HumanMessage):
+            lines.append(f"用户：{str(msg.content)[:max_chars]}")
+        elif isinstance(msg, AIMessage) and not msg.tool_calls and msg.content:
+            lines.append(f"助手：{str(msg.content)[:max_chars]}")
+    return lines
+
+
+def extractive_summarizer(max_tokens: int) -> Summarizer:
+    async def summarize(previous: str, messages: List[BaseMessage]) -> str:
+        lines = (previous.splitlines() if previous else []) + extract_turns(messages)
+        total = sum(len(line) for line in lines)
+        start = 0
+        while total > max_tokens and start < len(lines):
+            total -= len(lines[start])
+            start += 1
+        return "\n".join(lines[start:])
+
+    return summarize
+
+
+class ContextWindow:
+    def __init__(self, max_tokens: int = 4000, summary_tokens: int = 500, max_sessions: int = 1000,
+                 summarizer: Optional[Summarizer] = None):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_sessions = max_sessions
+        self.summarizer = summarizer or extractive_summarizer(summary_tokens)
+        # session_id -> (最后一条已并入摘要的消息 id, 摘要)
+        self._summaries: "OrderedDict[str, tuple[str, str]]" = OrderedDict()
+        self._stats = {"incremental": 0, "rebuilds": 0, "unchanged": 0}
+
+    def split(self, messages: List[BaseMessage]) -> int:
+        """返回窗口的起始下标：messages[start:] 原样保留，之前的部分需要摘要；max_tokens<=0 时不裁剪"""
+        if self.max_tokens <= 0:
+            return 0
+        turn_start = next((i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)), 0)
+        used = sum(estimate_tokens(m) for m in messages[turn_start:])
+        start = turn_start
+        for i in range(turn_start - 1, -1, -1):
+            used += estimate_tokens(messages[i])
+            if used > self.max_tokens:
+                break
+            if isinstance(messages[i], HumanMessage):
+                start = i
+        else:
+            # 全部历史都在预算内
+            return 0
+        return start
+
+    async def summarize(self, session_id: str, older: List[BaseMessage]) -> str:
+        """把窗口外的消息 older 并入该会话的摘要"""
+        previous, start = "", 0
+        cached = self._summaries.get(session_id)
+        if cached is not None:
+            last_id, summary = cached
+            # 上次摘要到的位置通常就在这次的窗口起点之前不远，从后往前找
+            index = next((i for i in range(len(older) - 1, -1, -1) if older[i].id == last_id), None)
+            if index is not None:
+                previous, start = summary, index + 1
+        if cached is not None and start == len(older):
+            self._stats["unchanged"] += 1
+            self._summaries.move_to_end(session_id)
+            return previous
+
+        self._stats["incremental" if start else "rebuilds"] += 1
+        summary = await self.summarizer(previous, older[start:])
+        if older[-1].id is not None:
+            self._summaries[session_id] = (older[-1].id, summary)
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+        return summary
+
+    def clear(self) -> None:
+        self._summaries.clear()
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._summaries), **self._stats}
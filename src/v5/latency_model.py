@@ -0,0 +1,131 @@
+"""
+MockLLM 的延迟 / 吞吐模型，用来在本地模拟真实模型服务商做压测：
+首 token 延迟（TTFT）分布、每秒 token 数、输出长度分布、错误 / 超时注入和限流，全部由 seed 控制可复现。
+
+配置方式：LatencyModel(**kwargs)，或 LatencyModel.from_env() 读取环境变量 MOCK_LLM_PROFILE，
+其值可以是 PROFILES 中的预设名，也可以是 JSON，例如 '{"ttft_ms": [300, 80], "tokens_per_sec": 40, "seed": 1}'。
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from langchain_core.messages import AIMessage
+
+
+class MockLLMError(Exception):
+    """注入的模型服务错误（类似 5xx）"""
+
+
+class MockTimeoutError(TimeoutError):
+    """注入的模型调用超时"""
+
+
+class MockRateLimitError(Exception):
+    """注入的限流错误（类似 429），retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry after {retry_after:.2f}s")
+        self.retry_after = retry_after
+
+
+# 常用预设：数值只是量级上的近似，用于容量规划时的对比
+PROFILES = {
+    "instant": {"ttft_ms": [0, 0], "tokens_per_sec": 0},
+    "fast": {"ttft_ms": [200, 50], "tokens_per_sec": 150},
+    "typical": {"ttft_ms": [600, 200], "tokens_per_sec": 50, "output_tokens": [200, 80]},
+    "slow": {"ttft_ms": [2000, 800], "tokens_per_sec": 20, "output_tokens": [400, 150], "error_rate": 0.01},
+}
+
+
+@dataclass
+class LatencyPlan:
+    """一次模型调用的执行计划：先等 ttft 秒，再每 interval 秒输出一个 token"""
+    message: AIMessage
+    ttft: float = 0.0
+    interval: float = 0.0
+    fault: Optional[Exception] = None
+    fault_after: float = 0.0  # 抛出 fault 之前需要等待的秒数（超时类故障）
+
+    @property
+    def total(self) -> float:
+        return self.ttft + self.interval * len(self.message.content)
+
+
+class LatencyModel:
+    """
+    - ttft_ms: 首 token 延迟 (均值, 标准差)，按截断正态分布采样
+    - prefill_tokens_per_sec: 输入处理速度，首 token 延迟额外加上 输入 token 数 / 该值；0 表示输入长度不影响延迟
+    - tokens_per_sec: 输出速度，0 表示 token 之间没有间隔
+    - output_tokens: 输出长度 (均值, 标准差)；回复比采样长度短时用 filler 补齐，None 表示保持原回复
+    - error_rate / timeout_rate: 注入错误 / 超时的概率，超时在等待 timeout_s 秒后抛出
+    - rate_limit_rpm: 每分钟最多接受的调用数（滑动窗口），超出抛 MockRateLimitError
+    - seed: 随机种子，相同 seed + 相同调用序列得到相同结果
+    """
+
+    def __init__(self, ttft_ms: Tuple[float, float] = (600, 200), tokens_per_sec: float = 50,
+                 output_tokens: Optional[Tuple[float, float]] = None, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_s: float = 30.0, rate_limit_rpm: Optional[int] = None,
+                 filler: str = "嗯", seed: Optional[int] = None, prefill_tokens_per_sec: float = 0):
+        self.ttft_ms = tuple(ttft_ms)
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.tokens_per_sec = tokens_per_sec
+        self.output_tokens = tuple(output_tokens) if output_tokens else None
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_s = timeout_s
+        self.rate_limit_rpm = rate_limit_rpm
+        self.filler = filler
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._calls = deque()
+        # 同一个模型可能同时被事件循环和线程池（offload_blocking）使用
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, var: str = "MOCK_LLM_PROFILE") -> Optional["LatencyModel"]:
+        raw = os.environ.get(var)
+        if not raw:
+            return None
+        return cls(**(PROFILES[raw] if raw in PROFILES else json.loads(raw)))
+
+    def _check_rate_limit(self, now: float) -> Optional[MockRateLimitError]:
+        if not self.rate_limit_rpm:
+            return None
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        if len(self._calls) >= self.rate_limit_rpm:
+            return MockRateLimitError(retry_after=60 - (now - self._calls[0]))
+        self._calls.append(now)
+        return None
+
+    def sample(self, message: AIMessage, prompt_tokens: int = 0) -> LatencyPlan:
+        with self._lock:
+            rate_limited = self._check_rate_limit(time.monotonic())
+            if rate_limited is not None:
+                return LatencyPlan(message=message, fault=rate_limited)
+
+            roll = self._rng.random()
+            if roll < self.error_rate:
+                return LatencyPlan(message=message, fault=MockLLMError("injected model error"))
+            if roll < self.error_rate + self.timeout_rate:
+                return LatencyPlan(message=message, fault=MockTimeoutError("injected model timeout"),
+                                   fault_after=self.timeout_s)
+
+            mean, std = self.ttft_ms
+            ttft = max(self._rng.gauss(mean, std), 0) / 1000 if std else mean / 1000
+            if self.prefill_tokens_per_sec > 0:
+                ttft += prompt_tokens / self.prefill_tokens_per_sec
+            interval = 1 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+            if self.output_tokens is not None:
+                length = max(int(self._rng.gauss(*self.output_tokens)), 1)
+                missing = length - len(message.content)
+                if missing > 0:
+                    message = message.model_copy(update={"content": message.content + self.filler * missing})
+
+        return LatencyPlan(message=message, ttft=ttft, interval=interval)
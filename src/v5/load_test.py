@@ -0,0 +1,181 @@
+"""
+/agent/invoke 压测工具（基于 AgentClient）
+
+- 闭环（默认）：concurrency 个并发 worker，每个请求完成后立刻发下一个，共 requests 个请求
+- 开环（--rate）：按泊松到达以 rate req/s 发请求，不等待前一个完成
+- 会话混合：--new-session-ratio 控制新会话比例，其余请求随机落到已有会话上（多轮对话）
+
+统计 TTFB（收到响应头）、TTFT（首个 token / model 事件）、事件间隔、总耗时的 p50/p95/p99 以及错误率，
+结果写成 JSON 报告（包含 git commit），便于跨提交对比。
+
+用法示例:
+    python load_test.py --concurrency 16 --requests 200 --mode token --output report.json
+    python load_test.py --rate 5 --requests 100 --new-session-ratio 0.3
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from agent_client import AgentClient
+
+DEFAULT_QUERIES = ["上海天气怎么样?", "今天天气如何", "你好", "weather in Shanghai"]
+
+
+@dataclass
+class RequestResult:
+    session_id: str
+    ok: bool = True
+    error: Optional[str] = None
+    ttfb_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    total_ms: float = 0.0
+    events: int = 0
+    gaps_ms: List[float] = field(default_factory=list)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 2)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+    }
+
+
+class SessionMix:
+    """按比例决定请求使用新会话还是已有会话"""
+
+    def __init__(self, new_session_ratio: float, rng: random.Random):
+        self.new_session_ratio = new_session_ratio
+        self.rng = rng
+        self.sessions: List[str] = []
+
+    def next_session(self) -> str:
+        if not self.sessions or self.rng.random() < self.new_session_ratio:
+            self.sessions.append(f"load_{len(self.sessions)}_{self.rng.getrandbits(32):08x}")
+            return self.sessions[-1]
+        return self.rng.choice(self.sessions)
+
+
+async def run_request(client: AgentClient, session_id: str, query: str, mode: str) -> RequestResult:
+    result = RequestResult(session_id=session_id)
+    timings: Dict = {}
+    start = last = time.perf_counter()
+    try:
+        async for event in client.invoke_stream(session_id, query, True, mode=mode, timings=timings):
+            now = time.perf_counter()
+            if result.events:
+                result.gaps_ms.append((now - last) * 1000)
+            last = now
+            result.events += 1
+            if result.ttft_ms is None and event.get("type") in ("token", "model"):
+                result.ttft_ms = (now - start) * 1000
+            if event.get("type") == "error":
+                result.ok, result.error = False, event.get("content")
+    except Exception as e:
+        result.ok, result.error = False, f"{type(e).__name__}: {e}"
+    if "headers" in timings:
+        result.ttfb_ms = (timings["headers"] - start) * 1000
+    result.total_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+async def closed_loop(client: AgentClient, args, mix: SessionMix, rng: random.Random) -> List[RequestResult]:
+    remaining = iter(range(args.requests))
+    results: List[RequestResult] = []
+
+    async def worker():
+        for _ in remaining:
+            results.append(await run_request(client, mix.next_session(), rng.choice(args.queries), args.mode))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return results
+
+
+async def open_loop(client: AgentClient, args, mix: SessionMix, rng: random.Random) -> List[RequestResult]:
+    tasks = []
+    for _ in range(args.requests):
+        tasks.append(asyncio.create_task(
+            run_request(client, mix.next_session(), rng.choice(args.queries), args.mode)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    return list(await asyncio.gather(*tasks))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(args, results: List[RequestResult], elapsed: float) -> Dict:
+    errors = [r for r in results if not r.ok]
+    return {
+        "commit": git_commit(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 3) if elapsed else None,
+        "error_rate": round(len(errors) / len(results), 4) if results else 0,
+        "errors": sorted({r.error for r in errors}),
+        "ttfb_ms": percentiles([r.ttfb_ms for r in results if r.ttfb_ms is not None]),
+        "ttft_ms": percentiles([r.ttft_ms for r in results if r.ttft_ms is not None]),
+        "inter_event_gap_ms": percentiles([g for r in results for g in r.gaps_ms]),
+        "total_ms": percentiles([r.total_ms for r in results]),
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    mix = SessionMix(args.new_session_ratio, rng)
+    async with AgentClient(args.url, limit=max(args.concurrency, 100)) as client:
+        start = time.perf_counter()
+        if args.rate:
+            results = await open_loop(client, args, mix, rng)
+        else:
+            results = await closed_loop(client, args, mix, rng)
+        elapsed = time.perf_counter() - start
+
+    report = build_report(args, results, elapsed)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        if args.raw:
+            with open(args.output + ".raw.jsonl", "w", encoding="utf-8") as f:
+                for r in results:
+                    f.write(json.dumps(asdict(r), ensure_ascii=False) + "\n")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="agent_server 压测")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--mode", choices=["node", "token"], default="node")
+    parser.add_argument("--concurrency", type=int, default=8, help="闭环模式的并发数")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=0, help="开环模式的到达速率 req/s，0 表示闭环")
+    parser.add_argument("--new-session-ratio", type=float, default=1.0, help="新会话比例，其余复用已有会话")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON 报告路径")
+    parser.add_argument("--raw", action="store_true", help="同时写出每个请求的原始记录")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,152 @@
+"""
+MCP 会话池：保持若干个已 initialize 的 ClientSession，在多次工具调用之间复用。
+
+MultiServerMCPClient.get_tools() 得到的工具每次调用都会新建 streamable-HTTP 连接并执行 initialize 握手，
+调用本身只占一小部分耗时。MCPSessionPool 实现了 ClientSession 中 list_tools / call_tool 两个方法，
+可以直接交给 langchain_mcp_adapters.tools.load_mcp_tools(pool) 生成工具，工具调用会落到池里的长连接上。
+
+- 一个 ClientSession 本身支持并发请求（按请求 id 复用），池里的会话按轮询分配，不独占
+- 每个会话在自己的后台任务里进入 / 退出连接上下文（anyio 要求在同一任务中进入和退出）
+- 只有连接层面的错误（连接断开、服务端重启后旧会话被拒绝、写入已关闭的流）才丢弃该会话并用新会话重试 retries 次；
+  服务端返回的协议错误（McpError：参数错误、超时等）说明会话本身正常，原样抛出、保留会话，也不重放请求；
+  工具自身的执行错误以 CallToolResult(isError=True) 返回，不会触发重连
+- 进度通知由会话的后台任务接收，progress_callback 会被切回发起调用时的上下文执行，
+  回调里可以拿到调用方的 contextvars（例如 LangGraph 的 stream writer）
+"""
+import asyncio
+import contextvars
+from typing import Any, List, Optional
+
+import anyio
+import httpx
+from langchain_mcp_adapters.sessions import Connection, create_session
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+# ClientSession 把传输层故障转换成 McpError 的两种错误码：读流关闭（CONNECTION_CLOSED），
+# 以及服务端对未知会话 id 返回 404（streamable HTTP 客户端用 32600 "Session terminated" 表示，注意不是 -32600）
+SESSION_TERMINATED = 32600
+TRANSPORT_ERRORS = (httpx.TransportError, anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+                    ConnectionError)
+
+
+def is_connection_error(e: BaseException) -> bool:
+    """会话已经不可用、需要重连的错误；其余错误（包括服务端返回的 McpError）不影响会话本身"""
+    if isinstance(e, McpError):
+        return e.error.code in (CONNECTION_CLOSED, SESSION_TERMINATED)
+    return isinstance(e, TRANSPORT_ERRORS)
+
+
+def in_caller_context(callback):
+    """把回调绑定到当前上下文：之后无论在哪个任务里触发，都在这个上下文的副本中执行"""
+    context = contextvars.copy_context()
+
+    async def run(*args):
+        await asyncio.get_running_loop().create_task(callback(*args), context=context)
+
+    return run
+
+
+class PooledSession:
+    def __init__(self, connection: Connection):
+        self.connection = connection
+        self.session: Optional[ClientSession] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self) -> "PooledSession":
+        self._ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run())
+        await self._ready
+        return self
+
+    async def _run(self) -> None:
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                self.session = session
+                self._ready.set_result(None)
+                await self._closing.wait()
+        except Exception as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+        finally:
+            self.session = None
+
+    async def close(self) -> None:
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except BaseException:
+                pass
+
+
+class MCPSessionPool:
+    def __init__(self, connection: Connection, size: int = 2, retries: int = 1):
+        self.connection = connection
+        self.size = size
+        self.retries = retries
+        self._sessions: List[Optional[PooledSession]] = [None] * size
+        self._locks = [asyncio.Lock() for _ in range(size)]
+        self._next = 0
+        self._stats = {"calls": 0, "connects": 0, "reconnects": 0, "failures": 0, "errors": 0}
+
+    async def _get(self, slot: int) -> PooledSession:
+        pooled = self._sessions[slot]
+        if pooled is not None and pooled.alive:
+            return pooled
+        async with self._locks[slot]:
+            pooled = self._sessions[slot]
+            if pooled is None or not pooled.alive:
+                pooled = self._sessions[slot] = await PooledSession(self.connection).start()
+                self._stats["connects"] += 1
+            return pooled
+
+    async def _discard(self, slot: int, pooled: PooledSession) -> None:
+        if self._sessions[slot] is pooled:
+            self._sessions[slot] = None
+        await pooled.close()
+
+    async def _request(self, method: str, *args, **kwargs) -> Any:
+        slot = self._next
+        self._next = (self._next + 1) % self.size
+        self._stats["calls"] += 1
+        for attempt in range(self.retries + 1):
+            pooled = await self._get(slot)
+            try:
+                return await getattr(pooled.session, method)(*args, **kwargs)
+            except Exception as e:
+                if not is_connection_error(e):
+                    self._stats["errors"] += 1
+                    raise
+                await self._discard(slot, pooled)
+                if attempt == self.retries:
+                    self._stats["failures"] += 1
+                    raise
+                self._stats["reconnects"] += 1
+
+    # ---- ClientSession 兼容接口（load_mcp_tools / 工具调用只用到这两个方法）----
+
+    async def list_tools(self, cursor: Optional[str] = None, **kwargs):
+        return await self._request("list_tools", cursor=cursor, **kwargs)
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None, progress_callback=None, **kwargs):
+        if progress_callback is not None:
+            progress_callback = in_caller_context(progress_callback)
+        return await self._request("call_tool", name, arguments, progress_callback=progress_callback, **kwargs)
+
+    async def close(self) -> None:
+        sessions = [s for s in self._sessions if s is not None]
+        self._sessions = [None] * self.size
+        await asyncio.gather(*(s.close() for s in sessions))
+
+    def stats(self) -> dict:
+        return {"size": self.size, "open": sum(1 for s in self._sessions if s is not None and s.alive),
+                **self._stats}
@@ -0,0 +1,187 @@
+"""
+进程内的轻量指标（Prometheus 文本格式），不依赖 prometheus_client：
+
+- Counter / Gauge / Histogram 只做字典查找和整数加法，热路径上没有锁（指标只在事件循环线程里更新）
+- MetricsCallbackHandler 挂到图的执行 config 上，统计节点耗时和每个工具的调用耗时
+- render() 输出 /metrics 的文本；多 worker 部署时每个进程各自统计，由 Prometheus 按实例聚合
+"""
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# 默认分桶（秒），覆盖从毫秒级的工具调用到几十秒的模型调用
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+registry: List["Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.append(self)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [每个桶的计数（非累计，最后一个是 +Inf）, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = _format_labels((*self.labelnames, "le"), (*labels, bound))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+def render(extra: Optional[Dict[str, float]] = None) -> str:
+    """渲染所有已注册指标；extra 为抓取时才计算的瞬时值（例如会话存储统计），按 gauge 输出"""
+    parts = [metric.render() for metric in registry]
+    typed = set()
+    for name, value in (extra or {}).items():
+        # name 可以带标签，例如 agent_mcp_pool_calls{server="weather"}
+        base = name.split("{", 1)[0]
+        if base not in typed:
+            typed.add(base)
+            parts.append(f"# TYPE {base} gauge")
+        parts.append(f"{name} {value}")
+    return "\n".join(parts) + "\n"
+
+
+# ---- agent_server 使用的指标 ----
+node_duration = Histogram("agent_node_duration_seconds", "LangGraph 节点耗时", ["node"])
+tool_call_duration = Histogram("agent_tool_call_duration_seconds", "工具调用耗时", ["tool", "status"])
+active_streams = Gauge("agent_active_streams", "正在输出的 SSE 流数量", ["mode"])
+stream_duration = Histogram("agent_stream_duration_seconds", "单个 SSE 流从开始到结束的耗时", ["mode"])
+sse_write_duration = Histogram("agent_sse_write_seconds", "单帧交给 ASGI 服务器后到下一帧开始生成的等待时间",
+                               ["mode"], buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1))
+events_emitted = Counter("agent_sse_events_total", "已发送的 SSE 帧数", ["mode"])
+bytes_sent = Counter("agent_sse_bytes_total", "已发送的 SSE 字节数（UTF-8）", ["mode"])
+
+
+async def instrument_stream(mode: str, frames):
+    """包装 SSE 帧生成器：统计活跃流、帧数、字节数、流耗时，以及每帧 yield 出去后等待消费的时间"""
+    active_streams.inc(mode)
+    start = time.perf_counter()
+    try:
+        async for frame in frames:
+            events_emitted.inc(mode)
+            bytes_sent.inc(mode, amount=len(frame.encode("utf-8")))
+            yielded = time.perf_counter()
+            yield frame
+            sse_write_duration.observe(time.perf_counter() - yielded, mode)
+    finally:
+        active_streams.dec(mode)
+        stream_duration.observe(time.perf_counter() - start, mode)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """通过 LangChain 回调统计节点耗时（call_model / tools）和各工具调用耗时"""
+
+    # 在事件循环里同步执行，不经过线程池
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, Tuple[str, float]] = {}
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        # 只统计节点本身，忽略节点内部的子 runnable 和条件边
+        if node is not None and kwargs.get("name") == node:
+            self._starts[run_id] = (node, time.perf_counter())
+
+    def _end_chain(self, run_id: UUID) -> None:
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            node_duration.observe(time.perf_counter() - started[1], started[0])
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "unknown"
+        self._starts[run_id] = (name, time.perf_counter())
+
+    def _end_tool(self, run_id: UUID, status: str) -> None:
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            tool_call_duration.observe(time.perf_counter() - started[1], started[0], status)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, "error")
+
+
+# 开始时间按 run_id 记录，并发请求之间互不干扰，所有请求共用一个实例
+metrics_handler = MetricsCallbackHandler()
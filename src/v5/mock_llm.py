@@ -1,25 +1,49 @@
+import json
+import asyncio
 import time
+from functools import partial
+from typing import Optional
 
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
-from langchain_core.outputs import ChatResult, ChatGeneration
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatResult, ChatGeneration, ChatGenerationChunk
 from langchain_core.tools import BaseTool
 
+from context_window import estimate_tokens
+from latency_model import LatencyModel, LatencyPlan
+
+# 模拟从问题中提取城市：问题里出现几个城市就在同一轮里发起几个工具调用，都没有时默认上海
+KNOWN_CITIES = ["上海", "北京", "广州", "深圳", "杭州", "成都", "南京", "武汉"]
+
 
 class MockLLM(BaseChatModel):
     # 存储通过bind_tools绑定的工具列表
     tools: list[BaseTool] = []
+    # True 时异步路径把阻塞的 _generate 放到线程池执行（模拟真正阻塞的后端）；
+    # 默认异步路径用 asyncio.sleep 模拟延迟，不占用事件循环也不占用线程
+    offload_blocking: bool = False
+    # 延迟 / 吞吐 / 故障注入模型，None 时使用固定延迟（见 latency_model.py）
+    latency_model: Optional[LatencyModel] = None
 
-    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
-        # 提取最新用户消息和工具返回结果
-        user_message = next((m for m in reversed(messages) if isinstance(m, HumanMessage)), None)
-        tool_messages = [m for m in messages if isinstance(m, ToolMessage)]
+    def _respond(self, messages) -> tuple[AIMessage, float]:
+        """根据消息生成回复，返回 (回复, 需要模拟的延迟秒数)，本身不阻塞"""
+        # 提取最新用户消息和本轮的工具返回结果：只看最后一条用户消息之后的消息，
+        # 之前轮次的工具结果不影响本轮，耗时也不随会话长度增长
+        user_message = None
+        tool_messages = []
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                user_message = m
+                break
+            if isinstance(m, ToolMessage):
+                tool_messages.insert(0, m)
 
         if not user_message:
-            return ChatResult(generations=[ChatGeneration(message=AIMessage(content="请输入问题"))])
+            return AIMessage(content="请输入问题"), 0
 
         content = user_message.content
         tool_calls = []
+        delay = 0
 
         # 关键逻辑：如果有绑定的工具且未收到工具返回结果，则调用第一个工具
         if self.tools and not tool_messages:
@@ -27,25 +51,110 @@ class MockLLM(BaseChatModel):
             first_tool = self.tools[0]
             # 模拟提取工具所需参数（这里以location为例，实际可根据工具schema动态处理）
             if "天气" in content or "weather" in content.lower():
-                tool_calls.append({
-                    "name": first_tool.name,  # 使用工具的名称
-                    "args": {"location": "上海"},  # 工具参数（可根据工具schema动态生成）
-                    "id": "tool_call_1"
-                })
-                time.sleep(2)
+                cities = [city for city in KNOWN_CITIES if city in content] or ["上海"]
+                # 问天气预报且绑定了预报工具时改用预报工具（耗时较长，会推送进度）
+                forecast_tool = next((t for t in self.tools if t.name == "get_weather_forecast"), None)
+                if "预报" in content and forecast_tool is not None:
+                    first_tool = forecast_tool
+                for i, city in enumerate(cities):
+                    tool_calls.append({
+                        "name": first_tool.name,  # 使用工具的名称
+                        "args": {"location": city},  # 工具参数（可根据工具schema动态生成）
+                        "id": f"tool_call_{i + 1}"
+                    })
+                delay = 2
                 response_content = f"正在调用{first_tool.name}工具查询信息..."
             else:
-                time.sleep(2)
+                delay = 2
                 response_content = f"你的问题我无法回答..."
         else:
             # 工具调用完成，返回最终结果
-            response_content = f"查询结果：{tool_messages[-1].content}" if tool_messages else "未找到信息"
+            # 汇总最近一轮的全部工具结果（一轮可能有多个并发的工具调用）
+            last_turn = tool_messages[-1:]
+            if tool_messages and isinstance(messages[-1], ToolMessage):
+                last_turn = []
+                for m in reversed(messages):
+                    if not isinstance(m, ToolMessage):
+                        break
+                    last_turn.insert(0, m)
+            response_content = ("查询结果：" + "；".join(str(m.content) for m in last_turn)) if last_turn else "未找到信息"
 
         message = AIMessage(
             content=response_content,
             tool_calls=tool_calls
         )
-        return ChatResult(generations=[ChatGeneration(message=message)])
+        return message, delay
+
+    def _plan(self, messages) -> LatencyPlan:
+        """生成回复并决定延迟：配置了 latency_model 时按模型采样，否则沿用固定延迟"""
+        message, delay = self._respond(messages)
+        if self.latency_model is None:
+            return LatencyPlan(message=message, ttft=delay)
+        prompt_tokens = 0
+        if self.latency_model.prefill_tokens_per_sec > 0:
+            prompt_tokens = sum(estimate_tokens(m) for m in messages)
+        return self.latency_model.sample(message, prompt_tokens)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        plan = self._plan(messages)
+        if plan.fault is not None:
+            time.sleep(plan.fault_after)
+            raise plan.fault
+        if plan.total:
+            time.sleep(plan.total)
+        return ChatResult(generations=[ChatGeneration(message=plan.message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        """异步生成：等待期间让出事件循环，多个会话可以并发执行"""
+        if self.offload_blocking:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, partial(self._generate, messages, stop))
+        plan = self._plan(messages)
+        if plan.fault is not None:
+            await asyncio.sleep(plan.fault_after)
+            raise plan.fault
+        if plan.total:
+            await asyncio.sleep(plan.total)
+        return ChatResult(generations=[ChatGeneration(message=plan.message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        """逐字输出，先等首 token 延迟，再按 tokens_per_sec 的间隔输出；工具调用放在最后一个 chunk 中（按 index 合并）"""
+        plan = self._plan(messages)
+        if plan.fault is not None:
+            time.sleep(plan.fault_after)
+            raise plan.fault
+        time.sleep(plan.ttft)
+        for chunk in self._chunks(plan.message):
+            if plan.interval:
+                time.sleep(plan.interval)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """异步逐字输出，延迟用 asyncio.sleep 模拟（offload_blocking 时整段在线程池生成后再输出）"""
+        if self.offload_blocking:
+            message = (await self._agenerate(messages, stop=stop, **kwargs)).generations[0].message
+            for chunk in self._chunks(message):
+                yield chunk
+            return
+        plan = self._plan(messages)
+        if plan.fault is not None:
+            await asyncio.sleep(plan.fault_after)
+            raise plan.fault
+        await asyncio.sleep(plan.ttft)
+        for chunk in self._chunks(plan.message):
+            if plan.interval:
+                await asyncio.sleep(plan.interval)
+            yield chunk
+
+    @staticmethod
+    def _chunks(message: AIMessage):
+        for ch in message.content:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=ch))
+        if message.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": tc["name"], "args": json.dumps(tc["args"], ensure_ascii=False), "id": tc["id"], "index": i}
+                for i, tc in enumerate(message.tool_calls)
+            ]))
 
     @property
     def _llm_type(self) -> str:
@@ -53,6 +162,6 @@ class MockLLM(BaseChatModel):
 
     # 实现bind_tools方法，用于将工具绑定到模型
     def bind_tools(self, tools: list[BaseTool]):
-        new_instance = MockLLM()
+        new_instance = MockLLM(offload_blocking=self.offload_blocking, latency_model=self.latency_model)
         new_instance.tools = tools  # 存储绑定的工具
         return new_instance
\ No newline at end of file
@@ -0,0 +1,280 @@
+import asyncio
+import json
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from langchain_core.messages import BaseMessage, HumanMessage, message_to_dict, messages_from_dict
+
+
+def estimate_message_bytes(msg: BaseMessage) -> int:
+    """粗略估算一条消息占用的内存（内容 + 工具调用参数），用于会话存储的内存统计"""
+    size = sys.getsizeof(msg) + sys.getsizeof(msg.content)
+    for call in getattr(msg, "tool_calls", None) or []:
+        size += sys.getsizeof(call.get("name", "")) + sys.getsizeof(str(call.get("args", "")))
+    return size
+
+
+def cap_messages(messages: List[BaseMessage], max_messages: int) -> List[BaseMessage]:
+    """只保留最近的 max_messages 条消息，并从 HumanMessage 处截断，避免工具消息和它的调用被拆开"""
+    if len(messages) <= max_messages:
+        return messages
+    kept = messages[-max_messages:]
+    return kept[first_human_index(kept):]
+
+
+def first_human_index(messages: List[BaseMessage]) -> int:
+    return next((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), len(messages))
+
+
+def dump_message(msg: BaseMessage) -> str:
+    """紧凑序列化单条消息：去掉空字段、不加空格，作为追加日志中的一条记录"""
+    record = message_to_dict(msg)
+    record["data"] = {k: v for k, v in record["data"].items() if v or k == "content"}
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_messages(records: List[str]) -> List[BaseMessage]:
+    return messages_from_dict([json.loads(r) for r in records])
+
+
+class SessionStore(ABC):
+    """会话存储接口：session_id -> chat_history"""
+
+    @abstractmethod
+    def get(self, session_id: str) -> List[BaseMessage]:
+        """返回会话历史；未知会话返回空列表且不创建条目。返回值不要原地修改"""
+
+    @abstractmethod
+    def set(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """整体替换会话历史"""
+
+    @abstractmethod
+    def append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        """只追加本轮新增的消息；超出上限的历史由实现方定期压缩"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """存储的统计指标（会话数、消息数、估算内存等）"""
+
+    def __contains__(self, session_id: str) -> bool:
+        return bool(self.get(session_id))
+
+    # 异步接口，供事件循环中的请求处理使用：默认直接调用同步方法（内存实现没有 I/O）；
+    # 有阻塞 I/O 的实现（Redis / SQLite）把调用放到线程池，避免锁等待或网络往返卡住整个事件循环
+    async def aget(self, session_id: str) -> List[BaseMessage]:
+        return self.get(session_id)
+
+    async def aappend(self, session_id: str, messages: List[BaseMessage]) -> None:
+        self.append(session_id, messages)
+
+    async def astats(self) -> Dict[str, int]:
+        return self.stats()
+
+
+@dataclass
+class _Session:
+    messages: List[BaseMessage]
+    nbytes: int
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class InMemorySessionStore(SessionStore):
+    """进程内 LRU + 空闲 TTL 的会话存储
+
+    - max_sessions: 会话数上限，超出时淘汰最久未访问的会话
+    - ttl_seconds: 会话空闲超过该时间后过期
+    - max_messages: 单个会话保留的最大消息数
+    - compact_slack: 追加时允许超出上限的消息数，超出后才压缩一次，摊薄截断的开销
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, max_messages: int = 200,
+                 compact_slack: int = 50):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.compact_slack = compact_slack
+        # 按最近访问时间排序，最久未访问的在最前面
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lru_evictions = 0
+        self._ttl_evictions = 0
+
+    def get(self, session_id: str) -> List[BaseMessage]:
+        now = time.monotonic()
+        session = self._sessions.get(session_id)
+        if session is None:
+            self._misses += 1
+            return []
+        if now - session.last_access > self.ttl_seconds:
+            self._remove(session_id)
+            self._ttl_evictions += 1
+            self._misses += 1
+            return []
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        self._hits += 1
+        return session.messages
+
+    def set(self, session_id: str, messages: List[BaseMessage]) -> None:
+        messages = cap_messages(list(messages), self.max_messages)
+        self._remove(session_id)
+        session = _Session(messages=messages, nbytes=sum(estimate_message_bytes(m) for m in messages))
+        self._sessions[session_id] = session
+        self._bytes += session.nbytes
+        self._evict(session.last_access)
+
+    def append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None and time.monotonic() - session.last_access > self.ttl_seconds:
+            # 与 get 一致：已过期但还没被淘汰的会话不再追加，从新会话开始
+            self._remove(session_id)
+            self._ttl_evictions += 1
+            session = None
+        if session is None:
+            self.set(session_id, messages)
+            return
+        session.messages.extend(messages)
+        added = sum(estimate_message_bytes(m) for m in messages)
+        session.nbytes += added
+        self._bytes += added
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        if len(session.messages) > self.max_messages + self.compact_slack:
+            self.set(session_id, session.messages)
+        else:
+            self._evict(session.last_access)
+
+    def delete(self, session_id: str) -> None:
+        self._remove(session_id)
+
+    def clear(self) -> None:
+        self._sessions.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "messages": sum(len(s.messages) for s in self._sessions.values()),
+            "bytes": self._bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "lru_evictions": self._lru_evictions,
+            "ttl_evictions": self._ttl_evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _remove(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+
+    def _evict(self, now: float) -> None:
+        # 先清理过期会话（队首最久未访问），再按 LRU 控制会话数
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl_seconds:
+                break
+            self._remove(session_id)
+            self._ttl_evictions += 1
+        while len(self._sessions) > self.max_sessions:
+            session_id = next(iter(self._sessions))
+            self._remove(session_id)
+            self._lru_evictions += 1
+
+
+class RedisSessionStore(SessionStore):
+    """共享会话存储：每个会话是一个 Redis 列表（或 sqlite_redis.SqliteRedis 本地替身），
+    列表的每个元素是一条紧凑 JSON 消息，每轮只 RPUSH 新增的消息（追加日志），
+    长度超过 max_messages + compact_slack 时用 LTRIM 压缩到最近 max_messages 条。
+    压缩只用一条负下标的 LTRIM（单条命令，原子执行），不先读再按读到的下标截断，
+    否则其他 worker 在两步之间 RPUSH 的消息会被截掉；截断处可能落在一轮对话中间，读取时再跳过开头不完整的那一轮。
+    多个 worker 进程访问同一份数据，因此可以用 workers>1 启动服务。
+
+    client 只需要提供 rpush / lrange / ltrim / expire / delete / dbsize / flushdb，且返回 str（decode_responses=True）。
+    """
+
+    def __init__(self, client, ttl_seconds: float = 1800, max_messages: int = 200, compact_slack: int = 50,
+                 prefix: str = "session:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.compact_slack = compact_slack
+        self.prefix = prefix
+        self._hits = 0
+        self._misses = 0
+        self._compactions = 0
+
+    def get(self, session_id: str) -> List[BaseMessage]:
+        records = self.client.lrange(self.prefix + session_id, 0, -1)
+        if not records:
+            self._misses += 1
+            return []
+        self._hits += 1
+        messages = load_messages(records)
+        if len(messages) >= self.max_messages:
+            # 可能被压缩截断过：从第一条 HumanMessage 开始，避免工具消息和它的调用被拆开
+            messages = messages[first_human_index(messages):]
+        return messages
+
+    def set(self, session_id: str, messages: List[BaseMessage]) -> None:
+        key = self.prefix + session_id
+        messages = cap_messages(list(messages), self.max_messages)
+        self.client.delete(key)
+        if messages:
+            self.client.rpush(key, *(dump_message(m) for m in messages))
+            self.client.expire(key, self.ttl_seconds)
+
+    def append(self, session_id: str, messages: List[BaseMessage]) -> None:
+        if not messages:
+            return
+        key = self.prefix + session_id
+        length = self.client.rpush(key, *(dump_message(m) for m in messages))
+        self.client.expire(key, self.ttl_seconds)
+        if length > self.max_messages + self.compact_slack:
+            self._compact(key)
+
+    def _compact(self, key: str) -> None:
+        """压缩追加日志：保留最近 max_messages 条记录（对并发的 RPUSH 安全，HumanMessage 边界由 get 处理）"""
+        self.client.ltrim(key, -self.max_messages, -1)
+        self._compactions += 1
+
+    def delete(self, session_id: str) -> None:
+        self.client.delete(self.prefix + session_id)
+
+    def clear(self) -> None:
+        self.client.flushdb()
+
+    # 每次调用都是网络往返（Redis）或可能等待写锁的磁盘事务（SQLite，最长 busy_timeout），放到线程池执行
+    async def aget(self, session_id: str) -> List[BaseMessage]:
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def aappend(self, session_id: str, messages: List[BaseMessage]) -> None:
+        await asyncio.to_thread(self.append, session_id, messages)
+
+    async def astats(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self.stats)
+
+    def stats(self) -> Dict[str, int]:
+        # hits/misses/compactions 为当前 worker 进程内的计数
+        return {
+            "sessions": self.client.dbsize(),
+            "hits": self._hits,
+            "misses": self._misses,
+            "compactions": self._compactions,
+        }
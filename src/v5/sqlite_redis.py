@@ -0,0 +1,191 @@
+"""
+基于本地 SQLite 的 Redis 替身：只实现会话存储用到的一小部分 redis-py 接口（字符串、列表 + 过期时间），
+同一个数据库文件可以被多个 uvicorn worker 进程共享（WAL 模式，读写互不阻塞）。
+写操作共用一个连接并串行执行；读操作使用每个线程自己的连接，不会排在等待写锁的事务后面。
+过期的 key 在读取时直接视为不存在，写操作（rpush / expire）每隔 purge_interval 秒顺带批量删除一次过期数据，
+没人再访问的会话不会一直留在数据库里。
+所有方法都是阻塞调用，在事件循环中应通过线程池调用（见 RedisSessionStore.aget / aappend）。
+生产环境可直接换成 redis.Redis(decode_responses=True)。
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+class SqliteRedis:
+    def __init__(self, path: str = "sessions.db", busy_timeout_ms: int = 5000, purge_interval: float = 60):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._readers = threading.local()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            # 列表按自增 id 保持插入顺序，rpush 只追加新行
+            "CREATE TABLE IF NOT EXISTS lists (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, value TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS lists_key ON lists (key, id);"
+            "CREATE TABLE IF NOT EXISTS expires (key TEXT PRIMARY KEY, expires_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS expires_at ON expires (expires_at);"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """写操作使用 IMMEDIATE 事务，避免多进程并发写时读到一半的状态"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @contextmanager
+    def _snapshot(self):
+        """只读事务：在当前线程的读连接上执行，多条查询看到同一个快照，且不等待写锁"""
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            conn = self._readers.conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _expired(conn, name: str) -> bool:
+        """读路径只判断是否过期，过期数据由写操作（_purge_if_expired）清理"""
+        row = conn.execute("SELECT expires_at FROM expires WHERE key = ?", (name,)).fetchone()
+        return row is not None and row[0] <= time.time()
+
+    def _purge_if_expired(self, name: str) -> None:
+        row = self._conn.execute("SELECT expires_at FROM expires WHERE key = ?", (name,)).fetchone()
+        if row is not None and row[0] <= time.time():
+            self._delete(name)
+
+    def _purge_expired(self) -> int:
+        """删除所有已过期的 key（在写事务内调用），距上次清理不足 purge_interval 秒时跳过；返回删除的 key 数"""
+        now = time.time()
+        if now < self._next_purge:
+            return 0
+        self._next_purge = now + self.purge_interval
+        expired = "SELECT key FROM expires WHERE expires_at <= ?"
+        self._conn.execute(f"DELETE FROM kv WHERE key IN ({expired})", (now,))
+        self._conn.execute(f"DELETE FROM lists WHERE key IN ({expired})", (now,))
+        return self._conn.execute("DELETE FROM expires WHERE expires_at <= ?", (now,)).rowcount
+
+    def _delete(self, name: str) -> int:
+        removed = self._conn.execute("DELETE FROM kv WHERE key = ?", (name,)).rowcount
+        removed += self._conn.execute("DELETE FROM lists WHERE key = ?", (name,)).rowcount
+        self._conn.execute("DELETE FROM expires WHERE key = ?", (name,))
+        return 1 if removed else 0
+
+    def _llen(self, name: str, conn=None) -> int:
+        return (conn or self._conn).execute("SELECT COUNT(*) FROM lists WHERE key = ?", (name,)).fetchone()[0]
+
+    @staticmethod
+    def _normalize(start: int, end: int, length: int):
+        """把 redis 风格的闭区间（支持负数下标）转换为 (offset, limit)"""
+        if start < 0:
+            start = max(length + start, 0)
+        if end < 0:
+            end = length + end
+        end = min(end, length - 1)
+        return start, max(end - start + 1, 0)
+
+    # ---------------- 字符串 ----------------
+    def get(self, name: str) -> Optional[str]:
+        with self._snapshot() as conn:
+            if self._expired(conn, name):
+                return None
+            row = conn.execute("SELECT value FROM kv WHERE key = ?", (name,)).fetchone()
+            return row[0] if row else None
+
+    def set(self, name: str, value: str, ex: Optional[float] = None) -> bool:
+        with self._transaction():
+            self._conn.execute(
+                "INSERT INTO kv (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (name, value),
+            )
+            if ex:
+                self._conn.execute("INSERT OR REPLACE INTO expires (key, expires_at) VALUES (?, ?)",
+                                   (name, time.time() + ex))
+            else:
+                self._conn.execute("DELETE FROM expires WHERE key = ?", (name,))
+        return True
+
+    # ---------------- 列表 ----------------
+    def rpush(self, name: str, *values: str) -> int:
+        with self._transaction():
+            self._purge_if_expired(name)
+            self._purge_expired()
+            self._conn.executemany("INSERT INTO lists (key, value) VALUES (?, ?)", [(name, v) for v in values])
+            return self._llen(name)
+
+    def lrange(self, name: str, start: int, end: int) -> List[str]:
+        with self._snapshot() as conn:
+            if self._expired(conn, name):
+                return []
+            offset, limit = self._normalize(start, end, self._llen(name, conn))
+            rows = conn.execute(
+                "SELECT value FROM lists WHERE key = ? ORDER BY id LIMIT ? OFFSET ?", (name, limit, offset)
+            ).fetchall()
+            return [r[0] for r in rows]
+
+    def ltrim(self, name: str, start: int, end: int) -> bool:
+        with self._transaction():
+            offset, limit = self._normalize(start, end, self._llen(name))
+            self._conn.execute(
+                "DELETE FROM lists WHERE key = ? AND id NOT IN "
+                "(SELECT id FROM lists WHERE key = ? ORDER BY id LIMIT ? OFFSET ?)",
+                (name, name, limit, offset),
+            )
+        return True
+
+    def llen(self, name: str) -> int:
+        with self._snapshot() as conn:
+            return 0 if self._expired(conn, name) else self._llen(name, conn)
+
+    # ---------------- 通用 ----------------
+    def delete(self, *names: str) -> int:
+        with self._transaction():
+            return sum(self._delete(n) for n in names)
+
+    def expire(self, name: str, time_seconds: float) -> bool:
+        with self._transaction():
+            self._purge_if_expired(name)
+            self._purge_expired()
+            exists = self._conn.execute(
+                "SELECT 1 FROM kv WHERE key = ? UNION ALL SELECT 1 FROM lists WHERE key = ? LIMIT 1", (name, name)
+            ).fetchone()
+            if not exists:
+                return False
+            self._conn.execute("INSERT OR REPLACE INTO expires (key, expires_at) VALUES (?, ?)",
+                               (name, time.time() + time_seconds))
+            return True
+
+    def dbsize(self) -> int:
+        """未过期的 key 数"""
+        with self._snapshot() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM (SELECT key FROM kv UNION SELECT DISTINCT key FROM lists) k "
+                "WHERE NOT EXISTS (SELECT 1 FROM expires e WHERE e.key = k.key AND e.expires_at <= ?)",
+                (time.time(),),
+            ).fetchone()[0]
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._conn.executescript("DELETE FROM kv; DELETE FROM lists; DELETE FROM expires;")
+        return True
+
+    def close(self) -> None:
+        self._conn.close()
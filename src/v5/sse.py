@@ -0,0 +1,99 @@
+"""
+增量 SSE 解码器：直接处理原始字节块，按事件边界（空行）切分，每个事件只做一次 UTF-8 解码。
+支持多行 data、event / id / retry 字段、\\r\\n 与 \\r 换行，以及跨 chunk 的事件与多字节字符。
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+try:
+    import orjson
+
+    def loads(data: str) -> Any:
+        return orjson.loads(data)
+except ImportError:  # orjson 可选，没有时退回标准库
+    loads = json.loads
+
+
+@dataclass(slots=True)
+class SSEEvent:
+    data: str
+    event: str = "message"
+    id: Optional[str] = None
+    retry: Optional[int] = None
+
+    def json(self) -> Any:
+        return loads(self.data)
+
+
+class SSEDecoder:
+    def __init__(self):
+        self._buf = bytearray()
+        # 上一块以 \r 结尾：它已经按换行处理，如果这一块以 \n 开头，说明两者是同一个 \r\n
+        self._skip_lf = False
+        # 最近一次收到的事件 id（SSE 的 id 字段）
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """喂入一段原始字节，返回其中所有完整的事件，不完整的部分留到下次"""
+        buf = self._buf
+        if self._skip_lf:
+            self._skip_lf = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+        if b"\r" in chunk:
+            # 只统一新到的这一块的换行符；末尾的 \r 无论是否和下一块的 \n 组成 \r\n 都是一个换行
+            self._skip_lf = chunk.endswith(b"\r")
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        buf += chunk
+
+        events = []
+        view = memoryview(buf)
+        start = 0
+        try:
+            while True:
+                end = buf.find(b"\n\n", start)
+                if end < 0:
+                    break
+                event = self._parse(str(view[start:end], "utf-8"))
+                if event is not None:
+                    events.append(event)
+                start = end + 2
+        finally:
+            view.release()
+        if start:
+            del buf[:start]
+        return events
+
+    def _parse(self, block: str) -> Optional[SSEEvent]:
+        # 快速路径：最常见的单行 data 事件
+        if block[:5] == "data:" and "\n" not in block:
+            return SSEEvent(block[6:] if block[5:6] == " " else block[5:], "message", None, self.retry)
+        data_lines = []
+        event_type = "message"
+        event_id = None
+        for line in block.split("\n"):
+            if line[:5] == "data:":
+                data_lines.append(line[6:] if line[5:6] == " " else line[5:])
+                continue
+            if not line or line[0] == ":":
+                continue  # 注释行（心跳）
+            field, sep, value = line.partition(":")
+            if sep and value[:1] == " ":
+                value = value[1:]
+            if field == "data":
+                data_lines.append(value)
+            elif field == "event":
+                event_type = value
+            elif field == "id":
+                if "\0" not in value:
+                    event_id = value
+            elif field == "retry":
+                if value.isdigit():
+                    self.retry = int(value)
+        if event_id is not None:
+            self.last_event_id = event_id
+        if not data_lines:
+            return None
+        return SSEEvent("\n".join(data_lines), event_type, event_id, self.retry)
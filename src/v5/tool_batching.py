@@ -0,0 +1,114 @@
+"""
+把并发的同名单参数工具调用合并成一次批量调用（例如 N 个 get_weather -> 1 个 get_weather_batch）：
+
+- 同一个事件循环里 max_wait_ms 内到达的调用（同一轮的多个 tool_calls，或不同会话的请求）组成一批，
+  达到 max_batch 立即发出；批内重复的参数只查一次
+- 批量工具按 MCP 结构化结果（artifact.structured_content，参数值 -> 结果）拆回各个调用；
+  批量调用失败时本批所有调用得到同一个异常，由 ToolNode 转成错误结果
+- 只有服务器同时提供了单个工具和对应的批量工具时才会启用
+"""
+import asyncio
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain_core.tools import BaseTool, ToolException
+
+# 单个工具名 -> (批量工具名, 单个工具的参数名, 批量工具的参数名)
+BATCH_TOOLS: Dict[str, Tuple[str, str, str]] = {
+    "get_weather": ("get_weather_batch", "location", "locations"),
+}
+
+# 当前生效的合并器（单个工具名 -> ToolBatcher），用于查看合并效果
+batchers: Dict[str, "ToolBatcher"] = {}
+
+
+def split_batch_result(result: Any) -> Dict[str, Any]:
+    """从批量工具的返回值中取出 参数值 -> 结果 的映射（优先用结构化结果，否则解析文本 JSON）"""
+    content, artifact = result if isinstance(result, tuple) else (result, None)
+    if isinstance(artifact, dict) and isinstance(artifact.get("structured_content"), dict):
+        return artifact["structured_content"]
+    if isinstance(content, list):
+        content = "".join(b.get("text", "") if isinstance(b, dict) else str(b) for b in content)
+    return json.loads(content)
+
+
+class ToolBatcher:
+    def __init__(self, batch_tool: BaseTool, batch_arg: str, max_batch: int = 32, max_wait_ms: float = 2):
+        self.batch_tool = batch_tool
+        self.batch_arg = batch_arg
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 正在执行的批量调用，保留强引用，避免任务在完成前被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"calls": 0, "batches": 0}
+
+    async def submit(self, value: str) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((value, future))
+        self.stats["calls"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self.stats["batches"] += 1
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        values = list(dict.fromkeys(value for value, _ in batch))
+        try:
+            results = split_batch_result(await self.batch_tool.coroutine(**{self.batch_arg: values}))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for value, future in batch:
+            if future.done():
+                continue
+            if value in results:
+                # 与单个 MCP 工具调用相同的返回形式：(带 id 的 content blocks, 结构化结果 artifact)，
+                # id 与 langchain-core 生成 content block 时的格式一致
+                block = {"type": "text", "text": str(results[value]), "id": f"lc_{uuid.uuid4()}"}
+                future.set_result(([block], {"structured_content": {"result": results[value]}}))
+            else:
+                future.set_exception(ToolException(f"{self.batch_tool.name} 未返回 {value} 的结果"))
+
+
+def batch_tools(tools: List[BaseTool], max_batch: int = 32, max_wait_ms: float = 2) -> List[BaseTool]:
+    """对有批量版本的工具替换执行逻辑（返回替换后的副本，其余工具原样返回）；max_wait_ms < 0 时不合并
+
+    替换后的工具不再执行原来的 coroutine，包在原工具外的并发上限和超时不会生效，需要调用方重新加上
+    （见 agent_core.wrap_tools）
+    """
+    if max_wait_ms < 0:
+        return tools
+    by_name = {t.name: t for t in tools}
+    result = []
+    for tool in tools:
+        spec = BATCH_TOOLS.get(tool.name)
+        if spec is None or spec[0] not in by_name or by_name[spec[0]].coroutine is None:
+            result.append(tool)
+            continue
+        batch_name, arg, batch_arg = spec
+        batcher = ToolBatcher(by_name[batch_name], batch_arg, max_batch, max_wait_ms)
+
+        async def batched(_batcher=batcher, _arg=arg, **kwargs):
+            return await _batcher.submit(kwargs[_arg])
+
+        batchers[tool.name] = batcher
+        result.append(tool.model_copy(update={"coroutine": batched}))
+    return result
@@ -0,0 +1,114 @@
+"""
+MCP 工具调用结果缓存：
+
+- key 为 工具名 + 规范化后的参数（按 key 排序的 JSON），每个工具单独配置 TTL，TTL<=0 的工具不缓存
+- 总条目数有上限，超出按 LRU 淘汰
+- single-flight：相同 key 的并发调用只真正执行一次，其余调用等待同一个结果；
+  调用方被取消不会取消底层调用（其他等待者仍能拿到结果）
+- 出错的调用不缓存，同一批等待者共享这次异常
+- clear() 之后，之前发起、之后才完成的调用不会把旧结果写回缓存，新的调用也不会合并到这些旧调用上
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.tools import BaseTool
+
+from metrics import Counter
+
+tool_cache_requests = Counter("agent_tool_cache_requests_total", "工具结果缓存查询次数", ["tool", "result"])
+
+
+def cache_key(tool_name: str, args: dict) -> str:
+    return tool_name + ":" + json.dumps(args, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    def __init__(self, max_entries: int = 1024, ttls: Optional[Dict[str, float]] = None, default_ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        # key -> (过期时间, 结果)
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 每次 clear() 加一；调用完成时代数已经变了，说明结果是按旧的工具定义算的，不再写入缓存
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expirations": 0}
+
+    def ttl_for(self, tool_name: str) -> float:
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def call(self, tool_name: str, args: dict, fn):
+        """fn 为无参协程函数，只在未命中且没有相同的进行中调用时执行"""
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0:
+            return await fn()
+
+        key = cache_key(tool_name, args)
+        hit, value = self._lookup(key)
+        if hit:
+            self._stats["hits"] += 1
+            tool_cache_requests.inc(tool_name, "hit")
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            tool_cache_requests.inc(tool_name, "coalesced")
+        else:
+            self._stats["misses"] += 1
+            tool_cache_requests.inc(tool_name, "miss")
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            generation = self._generation
+
+            def done(t: asyncio.Task):
+                # clear() 之后同一个 key 可能已经有了新的调用，只移除自己
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if generation == self._generation and not t.cancelled() and t.exception() is None:
+                    self._store(key, t.result(), ttl)
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        """清空缓存并脱离进行中的调用：它们的等待者仍会拿到结果，但结果不会写入缓存"""
+        self._generation += 1
+        self._entries.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "inflight": len(self._inflight), **self._stats}
+
+
+def cache_tool(tool: BaseTool, cache: ToolResultCache) -> BaseTool:
+    """返回带结果缓存的工具副本；该工具的 TTL<=0 时原样返回"""
+    if cache.ttl_for(tool.name) <= 0 or tool.coroutine is None:
+        return tool
+    original = tool.coroutine
+
+    async def cached(**kwargs):
+        return await cache.call(tool.name, kwargs, lambda: original(**kwargs))
+
+    return tool.model_copy(update={"coroutine": cached})
@@ -0,0 +1,60 @@
+"""
+工具调用的并发上限与超时：
+
+ToolNode 在一轮里会用 asyncio.gather 并发执行模型给出的全部 tool_calls，这里在每个工具外面再包一层：
+- 每个工具一个进程级 Semaphore，限制同时打到 MCP 服务器上的调用数（所有会话共享）
+- 每次调用一个超时，超时抛 ToolException
+- 配合 ToolNode(handle_tool_errors=format_tool_error)，单个调用失败只会变成一条 status="error" 的 ToolMessage，
+  同一轮的其他调用照常返回，模型据此继续回答（部分失败）
+"""
+import asyncio
+from dataclasses import dataclass
+from functools import partial
+from typing import Dict, Optional
+
+from langchain_core.tools import BaseTool, ToolException
+
+
+@dataclass
+class ToolLimit:
+    max_concurrency: int = 8
+    timeout: Optional[float] = 10.0  # 秒，None 表示不限
+
+
+# (工具名, 并发上限) -> Semaphore；工具清单刷新后同名工具继续共用同一个上限
+_semaphores: Dict[tuple, asyncio.Semaphore] = {}
+
+
+def _semaphore(name: str, max_concurrency: int) -> asyncio.Semaphore:
+    key = (name, max_concurrency)
+    if key not in _semaphores:
+        _semaphores[key] = asyncio.Semaphore(max_concurrency)
+    return _semaphores[key]
+
+
+def limit_tool(tool: BaseTool, limit: ToolLimit) -> BaseTool:
+    """返回带并发上限和超时的工具副本（名称、描述、参数 schema 不变）"""
+    original = tool.coroutine
+    if original is None:
+        # 同步工具放到线程池执行，避免阻塞事件循环
+        original = partial(asyncio.to_thread, tool.func)
+    semaphore = _semaphore(tool.name, limit.max_concurrency)
+
+    async def limited(*args, **kwargs):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(original(*args, **kwargs), limit.timeout)
+            except asyncio.TimeoutError:
+                raise ToolException(f"工具 {tool.name} 调用超时（{limit.timeout}s）") from None
+
+    return tool.model_copy(update={"coroutine": limited})
+
+
+def limit_tools(tools: list[BaseTool], default: ToolLimit, overrides: Optional[Dict[str, ToolLimit]] = None) -> list[BaseTool]:
+    overrides = overrides or {}
+    return [limit_tool(t, overrides.get(t.name, default)) for t in tools]
+
+
+def format_tool_error(e: Exception) -> str:
+    """ToolNode 的错误处理：把异常转成工具结果文本，不中断整轮执行"""
+    return f"工具调用失败: {type(e).__name__}: {e}"
@@ -0,0 +1,209 @@
+"""
+多 MCP 服务器的工具注册表：
+
+- 清单缓存：每个服务器的工具清单（名称、描述、输入 schema）连同版本哈希写到 cache_dir/<server>.json，
+  进程启动时先从磁盘读取，不需要连接任何服务器；refresh() 才会连接服务器拉取清单，哈希不变时不做任何事
+- 懒连接：会话池只在第一次真正调用该服务器的工具（或刷新清单）时才建立连接
+- 懒加载：LangChain 工具对象（含由 schema 生成的参数模型）在第一次用到时才从清单构建
+- ToolIndex：按问题用 BM25 检索相关工具，每个请求只把相关的工具绑定给模型
+"""
+import hashlib
+import heapq
+import json
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.callbacks import Callbacks
+from langchain_mcp_adapters.sessions import Connection, create_session
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.types import Tool as MCPTool
+
+from mcp_pool import MCPSessionPool
+
+
+@dataclass
+class ToolEntry:
+    server: str
+    name: str
+    description: str
+    manifest: dict  # MCP Tool 的 JSON（含 inputSchema）
+    tool: Optional[BaseTool] = None
+
+
+def manifest_hash(manifest: List[dict]) -> str:
+    payload = json.dumps(sorted(manifest, key=lambda t: t["name"]), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ToolRegistry:
+    def __init__(self, connections: Dict[str, Connection], cache_dir: str = ".mcp_manifests", pool_size: int = 2,
+                 callbacks: Optional[Callbacks] = None):
+        self.connections = connections
+        self.cache_dir = Path(cache_dir)
+        self.pool_size = pool_size
+        self.callbacks = callbacks
+        self.pools: Dict[str, MCPSessionPool] = {}
+        self.versions: Dict[str, str] = {}
+        # 工具名 -> 条目，按服务器配置顺序、服务器内按清单顺序
+        self.entries: Dict[str, ToolEntry] = {}
+
+    # ---- 清单 ----
+
+    @property
+    def version(self) -> str:
+        return hashlib.sha256("".join(f"{s}:{v}" for s, v in sorted(self.versions.items())).encode()).hexdigest()
+
+    def _manifest_path(self, server: str) -> Path:
+        return self.cache_dir / f"{server}.json"
+
+    def load_cached(self) -> int:
+        """从磁盘读取已缓存的清单，返回载入的服务器数（不连接服务器）"""
+        loaded = 0
+        for server in self.connections:
+            path = self._manifest_path(server)
+            if not path.exists():
+                continue
+            try:
+                cached = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            self._set_manifest(server, cached["tools"], cached["version"])
+            loaded += 1
+        return loaded
+
+    async def _list_tools(self, server: str) -> List[dict]:
+        pool = self.pool(server)
+        if pool is not None:
+            return await _list_all(pool)
+        async with create_session(self.connections[server]) as session:
+            await session.initialize()
+            return await _list_all(session)
+
+    async def refresh(self, servers: Optional[Iterable[str]] = None) -> List[str]:
+        """连接服务器拉取清单，返回清单有变化的服务器"""
+        changed = []
+        for server in servers or self.connections:
+            manifest = await self._list_tools(server)
+            version = manifest_hash(manifest)
+            if self.versions.get(server) == version:
+                continue
+            self._set_manifest(server, manifest, version)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._manifest_path(server).write_text(
+                json.dumps({"server": server, "version": version, "tools": manifest}, ensure_ascii=False, indent=1),
+                encoding="utf-8")
+            changed.append(server)
+        return changed
+
+    def _set_manifest(self, server: str, manifest: List[dict], version: str) -> None:
+        others = {name: e for name, e in self.entries.items() if e.server != server}
+        ours = {}
+        for item in manifest:
+            if item["name"] in others:
+                print(f"工具名冲突，忽略 {server}.{item['name']}（已由 {others[item['name']].server} 提供）")
+                continue
+            ours[item["name"]] = ToolEntry(server, item["name"], item.get("description") or "", item)
+        # 保持服务器配置顺序
+        merged = {**others, **ours}
+        order = list(self.connections)
+        self.entries = dict(sorted(merged.items(), key=lambda kv: order.index(kv[1].server)))
+        self.versions[server] = version
+
+    # ---- 工具 ----
+
+    def pool(self, server: str) -> Optional[MCPSessionPool]:
+        """会话池（创建时不连接）；pool_size<=0 时返回 None，工具每次调用新建会话"""
+        if self.pool_size <= 0:
+            return None
+        pool = self.pools.get(server)
+        if pool is None:
+            pool = self.pools[server] = MCPSessionPool(self.connections[server], size=self.pool_size)
+        return pool
+
+    def tool(self, name: str) -> BaseTool:
+        entry = self.entries[name]
+        if entry.tool is None:
+            entry.tool = convert_mcp_tool_to_langchain_tool(
+                self.pool(entry.server), MCPTool.model_validate(entry.manifest),
+                connection=self.connections[entry.server], callbacks=self.callbacks, server_name=entry.server)
+        return entry.tool
+
+    def tools(self, names: Optional[Iterable[str]] = None) -> List[BaseTool]:
+        return [self.tool(name) for name in (self.entries if names is None else names)]
+
+    async def close(self) -> None:
+        pools = list(self.pools.values())
+        self.pools.clear()
+        for pool in pools:
+            await pool.close()
+
+
+async def _list_all(session) -> List[dict]:
+    tools, cursor = [], None
+    while True:
+        page = await session.list_tools(cursor=cursor)
+        tools.extend(t.model_dump(mode="json", exclude_none=True) for t in page.tools)
+        cursor = page.nextCursor
+        if not cursor:
+            return tools
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[一-鿿]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """英文按单词（含 snake_case 拆分），中文按相邻两字切分"""
+    tokens = []
+    for part in _TOKEN_RE.findall(text.lower().replace("_", " ")):
+        if part.isascii():
+            tokens.append(part)
+        elif len(part) == 1:
+            tokens.append(part)
+        else:
+            tokens.extend(part[i:i + 2] for i in range(len(part) - 1))
+    return tokens
+
+
+class ToolIndex:
+    """对工具名称和描述建 BM25 倒排索引（随工具清单构建一次），按问题取得分最高的前 k 个工具
+
+    查询只遍历问题中各个词的倒排列表，耗时与工具总数基本无关；返回结果保持工具原有顺序，
+    相同的工具子集总是得到相同的列表（便于按子集缓存绑定了工具的模型）
+    """
+
+    def __init__(self, tools: List[BaseTool], k1: float = 1.2, b: float = 0.75):
+        self.names = [t.name for t in tools]
+        self.k1 = k1
+        self.b = b
+        docs = [tokenize(f"{t.name} {t.description}") for t in tools]
+        self._lengths = [len(d) for d in docs]
+        avg_length = sum(self._lengths) / len(docs) if docs else 0
+        # 词 -> [(工具下标, 词频)]
+        self._postings: Dict[str, List[tuple]] = {}
+        for i, doc in enumerate(docs):
+            for term, tf in Counter(doc).items():
+                self._postings.setdefault(term, []).append((i, tf))
+        n = len(docs)
+        self._idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self._postings.items()}
+        # 长度归一化项 k1 * (1 - b + b * dl / avgdl) 只与工具有关，预先算好
+        self._norms = [k1 * (1 - b + b * length / avg_length) if avg_length else k1 for length in self._lengths]
+
+    def scores(self, query: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + self._norms[i])
+        return scores
+
+    def lookup(self, query: str, k: int) -> List[str]:
+        scores = self.scores(query)
+        ranked = heapq.nlargest(k, scores, key=lambda i: (scores[i], -i))
+        return [self.names[i] for i in sorted(ranked)]
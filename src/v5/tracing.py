@@ -0,0 +1,304 @@
+"""
+可选的请求级链路追踪：每个被采样的请求记录一棵 span 树
+
+  request (POST /agent/invoke)
+   └─ graph (LangGraph)
+       ├─ node:call_model ─ llm:MockLLM
+       └─ node:tools ─ tool:get_weather
+   响应体写出的帧数 / 字节数 / 耗时，以及 SSE 序列化耗时记录在 request span 的属性上
+
+- TracingMiddleware（纯 ASGI 中间件，不缓冲流式响应）按 AGENT_TRACE_SAMPLE_RATE 采样并创建根 span
+- TracingCallbackHandler 挂到图的执行 config 上，把节点 / 模型 / 工具调用记录为子 span
+- 导出：AGENT_TRACE_EXPORT 为文件路径时按 JSON lines 追加（每行一个 trace），
+  为 http(s) URL 时按 OTLP/HTTP JSON 发给本地 collector（例如 http://localhost:4318/v1/traces）
+- 导出在后台线程里进行；未被采样的请求只多一次 random() 和一次 contextvar 读取
+"""
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACE_SAMPLE_RATE = float(os.environ.get("AGENT_TRACE_SAMPLE_RATE", "0"))
+TRACE_EXPORT = os.environ.get("AGENT_TRACE_EXPORT", "traces.jsonl")
+SERVICE_NAME = "mcp-agent-server"
+
+
+@dataclass(slots=True)
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """一次请求的全部 span；只在该请求的事件循环任务里修改，不需要加锁"""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.root = self.start_span(name, "request", None, **attributes)
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span], **attributes) -> Span:
+        span = Span(self.trace_id, os.urandom(8).hex(), parent.span_id if parent else None,
+                    name, kind, time.time_ns(), attributes=attributes)
+        self.spans.append(span)
+        return span
+
+    def add_time(self, key: str, seconds: float) -> None:
+        """把多次发生的小操作（例如每帧的序列化）累加到根 span 的属性上，避免逐帧生成 span"""
+        attributes = self.root.attributes
+        attributes[key] = attributes.get(key, 0.0) + seconds * 1000
+
+    def to_dict(self) -> dict:
+        return {"trace_id": self.trace_id, "spans": [s.to_dict() for s in self.spans]}
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def get_trace() -> Optional[Trace]:
+    return current_trace.get()
+
+
+# ---- 导出 ----
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> dict:
+    spans = []
+    for s in trace.spans:
+        span = {
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": 2 if s.kind == "request" else 1,  # SERVER / INTERNAL
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in {"kind": s.kind, **s.attributes}.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            span["parentSpanId"] = s.parent_id
+        spans.append(span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "agent_server.tracing"}, "spans": spans}],
+    }]}
+
+
+class TraceExporter:
+    """后台线程导出：请求结束时只把 trace 放进队列"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self._queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        self._queue.put(trace)
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if self.target.startswith(("http://", "https://")):
+                    self._post(trace)
+                else:
+                    with open(self.target, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+            except Exception as e:
+                # 导出失败不影响请求，丢弃该 trace
+                print(f"trace 导出失败: {e}")
+
+    def _post(self, trace: Trace) -> None:
+        body = json.dumps(to_otlp(trace), default=str).encode("utf-8")
+        request = urllib.request.Request(self.target, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def get_exporter() -> TraceExporter:
+    global _exporter
+    if _exporter is None:
+        _exporter = TraceExporter(TRACE_EXPORT)
+    return _exporter
+
+
+# ---- FastAPI / ASGI 中间件 ----
+
+class TracingMiddleware:
+    """按采样率为 HTTP 请求创建根 span，并统计响应体写出的帧数、字节数和写出耗时"""
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE, exporter: Optional[TraceExporter] = None):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}", path=scope["path"], method=scope["method"])
+        root = trace.root
+        root.attributes.update({"response.frames": 0, "response.bytes": 0, "response.send_ms": 0.0})
+        token = current_trace.set(trace)
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                root.attributes["status_code"] = message["status"]
+                message.setdefault("headers", []).append((b"x-trace-id", trace.trace_id.encode()))
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body:
+                    if "response.first_byte_ms" not in root.attributes:
+                        root.attributes["response.first_byte_ms"] = (time.time_ns() - root.start_ns) / 1e6
+                    root.attributes["response.frames"] += 1
+                    root.attributes["response.bytes"] += len(body)
+            start = time.perf_counter()
+            await send(message)
+            root.attributes["response.send_ms"] += (time.perf_counter() - start) * 1000
+
+        error = None
+        try:
+            await self.app(scope, receive, traced_send)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            current_trace.reset(token)
+            root.finish(error)
+            (self.exporter or get_exporter()).export(trace)
+
+
+# ---- LangChain 回调 ----
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """把一次图执行里的图 / 节点 / 模型 / 工具调用记录为 trace 的子 span（每个请求一个实例）"""
+
+    run_inline = True
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._spans: Dict[UUID, Span] = {}
+        # 没有单独记录 span 的 run（条件边、节点内部的 runnable）映射到最近的已记录祖先
+        self._parents: Dict[UUID, Optional[Span]] = {}
+
+    def _parent(self, parent_run_id: Optional[UUID]) -> Span:
+        if parent_run_id is None:
+            return self.trace.root
+        return self._spans.get(parent_run_id) or self._parents.get(parent_run_id) or self.trace.root
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: str, kind: str, **attributes) -> None:
+        self._spans[run_id] = self.trace.start_span(name, kind, self._parent(parent_run_id), **attributes)
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.finish(error)
+        self._parents.pop(run_id, None)
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None:
+            self._start(run_id, None, kwargs.get("name") or "graph", "graph")
+        elif node is not None and kwargs.get("name") == node:
+            self._start(run_id, parent_run_id, f"node:{node}", "node", step=(metadata or {}).get("langgraph_step"))
+        else:
+            self._parents[run_id] = self._parent(parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "chat_model"
+        self._start(run_id, parent_run_id, f"llm:{name}", "llm", input_messages=sum(len(m) for m in messages))
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.get(run_id)
+        if span is not None and "ttft_ms" not in span.attributes:
+            span.attributes["ttft_ms"] = (time.time_ns() - span.start_ns) / 1e6
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name") or "tool"
+        self._start(run_id, parent_run_id, f"tool:{name}", "tool")
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id, error)
+
+
+def tracing_callbacks() -> list:
+    """当前请求被采样时返回 [TracingCallbackHandler]，否则返回空列表"""
+    trace = current_trace.get()
+    return [TracingCallbackHandler(trace)] if trace is not None else []
+
+
+def traced_dumps(payload: dict) -> str:
+    """json.dumps，被采样的请求额外累计序列化耗时"""
+    trace = current_trace.get()
+    if trace is None:
+        return json.dumps(payload)
+    start = time.perf_counter()
+    data = json.dumps(payload)
+    trace.add_time("sse.serialize_ms", time.perf_counter() - start)
+    return data